@@ -3,15 +3,18 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from config import Config
 from flask_jwt_extended import JWTManager
+from flask_migrate import Migrate
 import cloudinary
 jwt = JWTManager()
 db = SQLAlchemy()
+migrate = Migrate()
     
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
     jwt.init_app(app)
     db.init_app(app)
+    migrate.init_app(app, db)
     CORS(app, 
          supports_credentials=True, 
          origins=["http://localhost:5173", "http://127.0.0.1:5173"],
@@ -26,12 +29,18 @@ def create_app():
         api_secret=app.config['CLOUDINARY_API_SECRET']
     )
 
+    from app.utils.uploads import configure_storage
+    configure_storage(app)
+
     # Ensure models are imported before db.create_all()
     from app import models
 
     with app.app_context():
         db.create_all()
 
+        from app.utils.search import init_search
+        init_search()
+
     from app.routes.items import item_bp
     from app.routes.swap import swap_bp
     from app.routes.admin import admin_bp
@@ -41,5 +50,39 @@ def create_app():
     app.register_blueprint(swap_bp)
     app.register_blueprint(admin_bp)
 
+    from app.utils.metrics import configure_metrics
+    configure_metrics(app)
+
+    from app.utils.auth_util import load_user, user_not_found
+    jwt.user_lookup_loader(load_user)
+    jwt.user_lookup_error_loader(user_not_found)
+
+    from app.utils.events import configure_events, start_event_polling
+    configure_events(app)
+
+    from app.utils.pagination import InvalidCursor, handle_invalid_cursor
+    app.register_error_handler(InvalidCursor, handle_invalid_cursor)
+
+    from app.utils.passwords import HashingBusy, handle_hashing_busy
+    app.register_error_handler(HashingBusy, handle_hashing_busy)
+
+    from app.utils.ingest import resume_ingest_command
+    app.cli.add_command(resume_ingest_command)
+
+    from app.utils.points import reconcile_points_command
+    app.cli.add_command(reconcile_points_command)
+
+    from app.utils.stats import rebuild_stats_command
+    app.cli.add_command(rebuild_stats_command)
+
+    from app.utils.rollups import backfill_rollups_command
+    app.cli.add_command(backfill_rollups_command)
+
+    from app.utils.sweeper import expire_swaps_command, start_sweeper
+    app.cli.add_command(expire_swaps_command)
+
+    from app.utils.background import start_when_serving
+    start_when_serving(app, start_sweeper, start_event_polling)
+
 
     return app
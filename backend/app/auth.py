@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_jwt_extended import create_access_token, set_access_cookies, unset_jwt_cookies, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, set_access_cookies, unset_jwt_cookies, jwt_required, get_jwt_identity, current_user
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 from app.models import User
 from app import db
+from app.utils.passwords import hash_password, verify_password
+from app.utils.stats import bump_counters
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -14,23 +17,27 @@ def register():
     if not all(field in data for field in ['username', 'name', 'email', 'password']):
         return jsonify({"success": False, "message": "Missing required fields"}), 400
 
-    if User.query.filter_by(email=data['email']).first():
-        return jsonify({"success": False, "message": "Email already exists"}), 400
-
-    if User.query.filter_by(username=data['username']).first():
-        return jsonify({"success": False, "message": "Username already exists"}), 400
-
     profile_picture = data.get('profile_picture', None)
 
     new_user = User(
         username=data['username'],
         name=data['name'],
         email=data['email'],
-        password_hash=generate_password_hash(data['password'], method='pbkdf2:sha256'),
+        password_hash=hash_password(data['password']),
         profile_picture=profile_picture
     )
 
-    db.session.add(new_user)
+    # The unique constraints catch duplicates; only a failed insert pays for finding out which
+    try:
+        db.session.add(new_user)
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        if User.query.filter_by(email=data['email']).first():
+            return jsonify({"success": False, "message": "Email already exists"}), 400
+        return jsonify({"success": False, "message": "Username already exists"}), 400
+
+    bump_counters({'users': 1})
     db.session.commit()
 
     return jsonify({"success": True, "message": "User registered successfully"}), 201
@@ -38,15 +45,25 @@ def register():
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
-    print("=== /login endpoint called ===")
     data = request.get_json()
     user = User.query.filter_by(email=data['email']).first()
 
-    if not user or not check_password_hash(user.password_hash, data['password']):
+    if not user:
+        return jsonify({"success": False, "message": "Invalid email or password"}), 401
+
+    matches, new_hash = verify_password(user.password_hash, data['password'])
+    if not matches:
         return jsonify({"success": False, "message": "Invalid email or password"}), 401
 
-    access_token = create_access_token(identity=str(user.id))
-    print("Created access token:", access_token[:20] + "...")
+    if new_hash:
+        # Stored with outdated parameters; swap in the stronger hash unless it changed meanwhile
+        db.session.execute(
+            update(User).where(User.id == user.id, User.password_hash == user.password_hash).values(password_hash=new_hash),
+            execution_options={"synchronize_session": False}
+        )
+        db.session.commit()
+
+    access_token = create_access_token(identity=str(user.id), additional_claims={"is_admin": bool(user.is_admin)})
     
     # Set cookie in response
     response = jsonify({
@@ -75,9 +92,6 @@ def login():
         samesite='None'  # Allow cross-origin requests
     )
     
-    print("Response headers after setting cookies:", dict(response.headers))
-    print("Response cookies:", response.headers.getlist('Set-Cookie'))
-    
     return response, 200
 
 
@@ -91,15 +105,7 @@ def logout():
 @auth_bp.route('/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
-    print("=== /me endpoint called ===")
-    print("Request cookies:", request.cookies)
-    user_id = int(get_jwt_identity())
-    print("User ID from JWT:", user_id)
-    user = User.query.get(user_id)
-    print("User found:", user is not None)
-    
-    if not user:
-        return jsonify({"success": False, "message": "User not found"}), 404
+    user = current_user
     
     return jsonify({
         "success": True,
@@ -119,15 +125,8 @@ def get_current_user():
 @jwt_required()
 def test_auth():
     """Test endpoint to verify JWT authentication is working"""
-    print("=== /test endpoint called ===")
-    print("Request cookies:", request.cookies)
-    print("JWT cookie value:", request.cookies.get('access_token_cookie'))
-    
     user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
-    
-    print("User ID from JWT:", user_id)
-    print("User found:", user is not None)
+    user = current_user
     
     return jsonify({
         "success": True,
@@ -140,13 +139,6 @@ def test_auth():
 @auth_bp.route('/debug-cookies', methods=['GET'])
 def debug_cookies():
     """Debug endpoint to check what cookies are being sent"""
-    print("=== /debug-cookies endpoint called ===")
-    print("All request cookies:", dict(request.cookies))
-    print("JWT cookie:", request.cookies.get('access_token_cookie'))
-    print("Request headers:", dict(request.headers))
-    print("Origin:", request.headers.get('Origin'))
-    print("Referer:", request.headers.get('Referer'))
-    
     return jsonify({
         "success": True,
         "cookies": dict(request.cookies),
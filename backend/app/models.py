@@ -22,6 +22,11 @@ class User(db.Model):
     redemptions = db.relationship('Redemption', backref='user', lazy=True)
     admin_actions = db.relationship('AdminAction', backref='admin', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_users_created_at', 'created_at'),
+    )
+
+
 class Item(db.Model):
         __tablename__ = 'items'
 
@@ -37,8 +42,20 @@ class Item(db.Model):
         approved = db.Column(db.Boolean, default=False)
         uploader_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
         created_at = db.Column(db.DateTime, default=datetime.utcnow)
+        updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+        version = db.Column(db.Integer, nullable=False, server_default='1')  # bumped on every update
 
         images = db.relationship('ItemImage', backref='item', lazy=True, cascade='all, delete-orphan')
+        tag_list = db.relationship('Tag', secondary='item_tags', backref=db.backref('items', lazy='dynamic'), lazy=True)
+
+        __table_args__ = (
+            db.Index('ix_items_approved_status_created_at', 'approved', 'status', 'created_at'),
+            db.Index('ix_items_created_at', 'created_at'),
+            db.Index('ix_items_category_created_at', 'category', 'created_at'),
+            db.Index('ix_items_uploader_id_created_at', 'uploader_id', 'created_at'),
+        )
+        # ORM updates become compare-and-set: UPDATE ... WHERE version = <loaded version>
+        __mapper_args__ = {'version_id_col': version}
 
 
 class ItemImage(db.Model):
@@ -47,6 +64,41 @@ class ItemImage(db.Model):
         id = db.Column(db.Integer, primary_key=True)
         item_id = db.Column(db.Integer, db.ForeignKey('items.id'), nullable=False)
         image_url = db.Column(db.String(255), nullable=False)
+        content_hash = db.Column(db.String(64), nullable=True)  # sha256 of the original bytes
+
+        __table_args__ = (
+            db.Index('ix_item_images_item_id', 'item_id'),
+        )
+
+
+item_tags = db.Table(
+        'item_tags',
+        db.Column('item_id', db.Integer, db.ForeignKey('items.id', ondelete='CASCADE'), primary_key=True),
+        db.Column('tag_id', db.Integer, db.ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True),
+        db.Index('ix_item_tags_tag_id_item_id', 'tag_id', 'item_id')
+)
+
+
+class ImageBlob(db.Model):
+        """Stored image URL for each distinct image content"""
+        __tablename__ = 'image_blobs'
+
+        id = db.Column(db.Integer, primary_key=True)
+        content_hash = db.Column(db.String(64), unique=True, nullable=False)
+        image_url = db.Column(db.String(255), nullable=False)
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Tag(db.Model):
+        __tablename__ = 'tags'
+
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(50), unique=True, nullable=False)
+        item_count = db.Column(db.Integer, default=0, nullable=False)  # approved, available items only
+
+        __table_args__ = (
+            db.Index('ix_tags_item_count', 'item_count'),
+        )
 
 
 class Swap(db.Model):
@@ -55,11 +107,21 @@ class Swap(db.Model):
         id = db.Column(db.Integer, primary_key=True)
         requester_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
         requested_item_id = db.Column(db.Integer, db.ForeignKey('items.id', ondelete='CASCADE'), nullable=False)
-        offered_item_id = db.Column(db.Integer, db.ForeignKey('items.id', ondelete='CASCADE'), nullable=False)
+        offered_item_id = db.Column(db.Integer, db.ForeignKey('items.id', ondelete='CASCADE'), nullable=True)  # empty for points swaps
         swap_type = db.Column(db.String(50), nullable=False) #direct or points
-        status = db.Column(db.String(50), default='pending')    #panding, accepted, rejected , cancelled
+        status = db.Column(db.String(50), default='pending')    #panding, accepted, rejected , cancelled, expired
         created_at = db.Column(db.DateTime, default=datetime.utcnow)
         updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+        version = db.Column(db.Integer, nullable=False, server_default='1')  # bumped on every update
+
+        __table_args__ = (
+            db.Index('ix_swaps_requester_id_created_at', 'requester_id', 'created_at'),
+            db.Index('ix_swaps_requested_item_id_status', 'requested_item_id', 'status'),
+            db.Index('ix_swaps_offered_item_id', 'offered_item_id'),
+            db.Index('ix_swaps_created_at', 'created_at'),
+            db.Index('ix_swaps_status_created_at', 'status', 'created_at'),
+        )
+        __mapper_args__ = {'version_id_col': version}
 
 
 class Redemption(db.Model):
@@ -68,10 +130,49 @@ class Redemption(db.Model):
         id = db.Column(db.Integer, primary_key=True)
         user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
         item_id = db.Column(db.Integer, db.ForeignKey('items.id', ondelete='CASCADE'), nullable=False)
+        swap_id = db.Column(db.Integer, db.ForeignKey('swaps.id', ondelete='SET NULL'), nullable=True)
         points_used = db.Column(db.Integer, nullable=False)
         status = db.Column(db.String(50), default='pending')
         created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+        __table_args__ = (
+            db.Index('ix_redemptions_user_id_item_id', 'user_id', 'item_id'),
+            db.Index('ix_redemptions_item_id', 'item_id'),
+            db.Index('ix_redemptions_swap_id', 'swap_id'),
+        )
+
+
+class PointsLedger(db.Model):
+        """Append-only record of every change to a user's points balance"""
+        __tablename__ = 'points_ledger'
+
+        id = db.Column(db.Integer, primary_key=True)
+        user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+        delta = db.Column(db.Integer, nullable=False)
+        balance_after = db.Column(db.Integer, nullable=False)
+        reason = db.Column(db.String(50), nullable=False)  # opening_balance, swap_hold, swap_refund, swap_expired, admin_grant
+        swap_id = db.Column(db.Integer, db.ForeignKey('swaps.id', ondelete='SET NULL'), nullable=True)
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+        __table_args__ = (
+            db.Index('ix_points_ledger_user_id_id', 'user_id', 'id'),
+        )
+
+
+class SwapEvent(db.Model):
+        """Swap notifications shared between worker processes by the database event broker"""
+        __tablename__ = 'swap_events'
+
+        id = db.Column(db.Integer, primary_key=True)
+        type = db.Column(db.String(50), nullable=False)
+        user_ids = db.Column(db.Text, nullable=False)  # JSON list of recipients
+        payload = db.Column(db.Text, nullable=False)  # JSON
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+        __table_args__ = (
+            db.Index('ix_swap_events_created_at', 'created_at'),
+        )
+
 
 class AdminAction(db.Model):
         __tablename__ = 'admin_actions'
@@ -83,4 +184,35 @@ class AdminAction(db.Model):
         reason = db.Column(db.String(255), nullable=True)
         created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-       
\ No newline at end of file
+        __table_args__ = (
+            db.Index('ix_admin_actions_created_at', 'created_at'),
+            db.Index('ix_admin_actions_item_id', 'item_id'),
+        )
+
+
+class StatsCounter(db.Model):
+        """Running totals for the admin dashboard, updated by the writes that change them"""
+        __tablename__ = 'stats_counters'
+
+        name = db.Column(db.String(100), primary_key=True)  # e.g. items, swaps_completed, category:Tops
+        value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ActivityRollup(db.Model):
+        """Hourly and daily activity counts per category, updated by the writes they count"""
+        __tablename__ = 'activity_rollups'
+
+        period = db.Column(db.String(10), primary_key=True)  # hour, day
+        bucket_start = db.Column(db.DateTime, primary_key=True)
+        metric = db.Column(db.String(50), primary_key=True)  # items_listed, swaps_accepted, items_approved, ...
+        category = db.Column(db.String(50), primary_key=True)
+        count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CatalogVersion(db.Model):
+        """Single row bumped by every write that changes what is listed"""
+        __tablename__ = 'catalog_version'
+
+        id = db.Column(db.Integer, primary_key=True)
+        version = db.Column(db.Integer, nullable=False, default=0)
+        updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -1,18 +1,35 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, current_user
 from app import db
 from app.models import Item, User, AdminAction, Swap, Redemption
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from app.utils.auth_util import invalidate_users
+from app.utils.exports import export_rows, EXPORTS, FORMATS
+from app.utils.facets import invalidate_facets
+from app.utils.http_cache import bump_catalog_version
+from app.utils.moderation import moderate_in_bulk, ModerationConflict, MODERATION_ACTIONS
+from app.utils.pagination import paginate_query
+from app.utils.points import credit_points
+from app.utils.rollups import record_activity, load_activity, bucket_start, MODERATION_METRICS, METRICS, PERIODS
+from app.utils.serializers import serialize_items
+from app.utils.stats import get_dashboard, bump_counters
+from app.utils.tags import item_tag_ids, refresh_tag_counts
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.exc import StaleDataError
+from config import Config
+from datetime import datetime, timedelta, timezone
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
 
 def check_admin():
-    """Helper function to check if user is admin"""
-    user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
-    if not user or not user.is_admin:
+    """Admin check from the token's is_admin claim and the cached user, no query.
+
+    The cached user catches admins demoted since the token was issued;
+    tokens from before the claim existed go by the cached user alone.
+    """
+    user = current_user
+    if not get_jwt().get('is_admin', user.is_admin) or not user.is_admin:
         return False, user
     return True, user
 
@@ -24,53 +41,8 @@ def admin_dashboard():
     if not is_admin:
         return jsonify({"success": False, "message": "Admin access required"}), 403
     
-    # Get statistics
-    total_users = User.query.count()
-    total_items = Item.query.count()
-    pending_items = Item.query.filter_by(approved=False).count()
-    total_swaps = Swap.query.count()
-    completed_swaps = Swap.query.filter_by(status='accepted').count()
-    
-    # Recent activity
-    recent_items = Item.query.order_by(Item.created_at.desc()).limit(5).all()
-    recent_swaps = Swap.query.order_by(Swap.created_at.desc()).limit(5).all()
-    
-    # Items by category
-    category_stats = db.session.query(
-        Item.category, 
-        func.count(Item.id)
-    ).group_by(Item.category).all()
-    
-    return jsonify({
-        "success": True,
-        "stats": {
-            "total_users": total_users,
-            "total_items": total_items,
-            "pending_items": pending_items,
-            "total_swaps": total_swaps,
-            "completed_swaps": completed_swaps
-        },
-        "recent_items": [{
-            "id": item.id,
-            "title": item.title,
-            "category": item.category,
-            "status": item.status,
-            "approved": item.approved,
-            "created_at": item.created_at.isoformat(),
-            "uploader": User.query.get(item.uploader_id).username
-        } for item in recent_items],
-        "recent_swaps": [{
-            "id": swap.id,
-            "swap_type": swap.swap_type,
-            "status": swap.status,
-            "created_at": swap.created_at.isoformat(),
-            "requester": User.query.get(swap.requester_id).username
-        } for swap in recent_swaps],
-        "category_stats": [{
-            "category": category,
-            "count": count
-        } for category, count in category_stats]
-    }), 200
+    # Counters are kept up to date by the writes themselves
+    return jsonify({"success": True, **get_dashboard()}), 200
 
 
 @admin_bp.route('/items/pending', methods=['GET'])
@@ -80,46 +52,14 @@ def get_pending_items():
     if not is_admin:
         return jsonify({"success": False, "message": "Admin access required"}), 403
     
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    
-    pending_items = Item.query.filter_by(approved=False).paginate(
-        page=page, per_page=per_page, error_out=False
+    pending_items, pagination = paginate_query(
+        Item.query.filter_by(approved=False), Item, default_per_page=10
     )
     
-    items_data = []
-    for item in pending_items.items:
-        uploader = User.query.get(item.uploader_id)
-        images = [img.image_url for img in item.images]
-        
-        items_data.append({
-            "id": item.id,
-            "title": item.title,
-            "description": item.description,
-            "category": item.category,
-            "type": item.type,
-            "size": item.size,
-            "condition": item.condition,
-            "tags": item.tags,
-            "status": item.status,
-            "created_at": item.created_at.isoformat(),
-            "uploader": {
-                "id": uploader.id,
-                "username": uploader.username,
-                "name": uploader.name
-            },
-            "images": images
-        })
-    
     return jsonify({
         "success": True,
-        "items": items_data,
-        "pagination": {
-            "page": page,
-            "per_page": per_page,
-            "total": pending_items.total,
-            "pages": pending_items.pages
-        }
+        "items": serialize_items(pending_items, image_size='card'),
+        "pagination": pagination
     }), 200
 
 
@@ -155,6 +95,7 @@ def moderate_item(item_id):
     )
     db.session.add(admin_action)
     
+    was_pending = not item.approved
     if action == 'approve':
         item.approved = True
         item.status = 'available'
@@ -164,7 +105,18 @@ def moderate_item(item_id):
     elif action == 'remove':
         item.status = 'removed'
     
+    try:
+        db.session.flush()
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({"success": False, "message": "Item was changed by another request"}), 409
+    
+    refresh_tag_counts(item_tag_ids([item.id]))
+    bump_counters({'items_pending': (not item.approved) - was_pending})
+    record_activity([(MODERATION_METRICS[action], item.category, None)])
+    bump_catalog_version()
     db.session.commit()
+    invalidate_facets()
     
     return jsonify({
         "success": True,
@@ -172,25 +124,126 @@ def moderate_item(item_id):
     }), 200
 
 
+@admin_bp.route('/items/moderate', methods=['POST'])
+@jwt_required()
+def moderate_items():
+    """Approve, reject or remove many items in one transaction"""
+    is_admin, user = check_admin()
+    if not is_admin:
+        return jsonify({"success": False, "message": "Admin access required"}), 403
+    
+    admin_id = int(get_jwt_identity())
+    data = request.get_json()
+    
+    entries = data.get('items') if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"success": False, "message": "List of items required"}), 400
+    
+    if len(entries) > Config.MAX_BATCH_SIZE:
+        return jsonify({
+            "success": False,
+            "message": f"At most {Config.MAX_BATCH_SIZE} items per request"
+        }), 400
+    
+    if not all(isinstance(entry, dict) and isinstance(entry.get('item_id'), int)
+               and entry.get('action') in MODERATION_ACTIONS for entry in entries):
+        return jsonify({
+            "success": False,
+            "message": "Each entry needs an item_id and an action of approve, reject or remove"
+        }), 400
+    
+    moderation = [(entry['item_id'], entry['action'], entry.get('reason', '')) for entry in entries]
+    
+    # A concurrent change fails the compare-and-set; start over from fresh state
+    for _ in range(3):
+        try:
+            results, item_ids, pending_delta = moderate_in_bulk(admin_id, moderation)
+            if item_ids:
+                refresh_tag_counts(item_tag_ids(item_ids))
+                bump_counters({'items_pending': pending_delta})
+                record_activity((MODERATION_METRICS[result['action']], db.session.get(Item, result['item_id']).category, None)
+                                for result in results if result['success'])
+                bump_catalog_version()
+            db.session.commit()
+            break
+        except (ModerationConflict, StaleDataError):
+            db.session.rollback()
+    else:
+        return jsonify({"success": False, "message": "Items changed by another request, try again"}), 409
+    
+    if item_ids:
+        invalidate_facets()
+    
+    return jsonify({
+        "success": True,
+        "results": results,
+        "moderated": len(item_ids),
+        "failed": len(results) - len(item_ids)
+    }), 200
+
+
 @admin_bp.route('/users', methods=['GET'])
 @jwt_required()
 def get_users():
+    """List users with activity stats, sortable and filterable by them"""
     is_admin, user = check_admin()
     if not is_admin:
         return jsonify({"success": False, "message": "Admin access required"}), 403
     
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    
-    users = User.query.paginate(
-        page=page, per_page=per_page, error_out=False
+    # Correlated counts: in ORDER BY / WHERE they use the per-user indexes,
+    # and the page itself is counted with one grouped query each below
+    items_count = select(func.count(Item.id)).where(Item.uploader_id == User.id).correlate(User).scalar_subquery()
+    swaps_count = select(func.count(Swap.id)).where(Swap.requester_id == User.id).correlate(User).scalar_subquery()
+    points = func.coalesce(User.points_balance, 0)
+    sort_columns = {
+        'created_at': User.created_at,
+        'items_count': items_count,
+        'swaps_count': swaps_count,
+        'points_balance': points
+    }
+    
+    sort = request.args.get('sort', 'created_at')
+    order = request.args.get('order', 'desc').lower()
+    if sort not in sort_columns or order not in ('asc', 'desc'):
+        return jsonify({
+            "success": False,
+            "message": f"sort must be one of {', '.join(sort_columns)} and order asc or desc"
+        }), 400
+    
+    query = User.query
+    try:
+        for name, column in (('items', items_count), ('swaps', swaps_count), ('points', points)):
+            minimum = request.args.get(f'min_{name}')
+            maximum = request.args.get(f'max_{name}')
+            if minimum is not None:
+                query = query.filter(column >= int(minimum))
+            if maximum is not None:
+                query = query.filter(column <= int(maximum))
+        
+        joined_after = request.args.get('joined_after')
+        joined_before = request.args.get('joined_before')
+        if joined_after:
+            query = query.filter(User.created_at >= datetime.fromisoformat(joined_after))
+        if joined_before:
+            query = query.filter(User.created_at < datetime.fromisoformat(joined_before))
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid filter value"}), 400
+    
+    users, pagination = paginate_query(
+        query, User, default_per_page=20,
+        sort_column=sort_columns[sort], descending=order == 'desc'
     )
     
+    user_ids = [user.id for user in users]
+    items_counts = dict(db.session.query(Item.uploader_id, func.count(Item.id)).filter(
+        Item.uploader_id.in_(user_ids)
+    ).group_by(Item.uploader_id).all()) if user_ids else {}
+    swaps_counts = dict(db.session.query(Swap.requester_id, func.count(Swap.id)).filter(
+        Swap.requester_id.in_(user_ids)
+    ).group_by(Swap.requester_id).all()) if user_ids else {}
+    
     users_data = []
-    for user in users.items:
-        items_count = Item.query.filter_by(uploader_id=user.id).count()
-        swaps_count = Swap.query.filter_by(requester_id=user.id).count()
-        
+    for user in users:
         users_data.append({
             "id": user.id,
             "username": user.username,
@@ -200,20 +253,17 @@ def get_users():
             "points_balance": user.points_balance,
             "created_at": user.created_at.isoformat(),
             "stats": {
-                "items_count": items_count,
-                "swaps_count": swaps_count
+                "items_count": items_counts.get(user.id, 0),
+                "swaps_count": swaps_counts.get(user.id, 0)
             }
         })
     
     return jsonify({
         "success": True,
         "users": users_data,
-        "pagination": {
-            "page": page,
-            "per_page": per_page,
-            "total": users.total,
-            "pages": users.pages
-        }
+        "pagination": pagination,
+        "sort": sort,
+        "order": order
     }), 200
 
 
@@ -234,6 +284,7 @@ def toggle_admin_status(user_id):
         return jsonify({"success": False, "message": "User not found"}), 404
     
     user.is_admin = not user.is_admin
+    invalidate_users([user.id])
     db.session.commit()
     
     return jsonify({
@@ -259,17 +310,16 @@ def add_points(user_id):
     if not isinstance(points, int) or points <= 0:
         return jsonify({"success": False, "message": "Points must be a positive integer"}), 400
     
-    user = User.query.get(user_id)
-    if not user:
+    new_balance = credit_points(user_id, points, 'admin_grant')
+    if new_balance is None:
         return jsonify({"success": False, "message": "User not found"}), 404
     
-    user.points_balance += points
     db.session.commit()
     
     return jsonify({
         "success": True,
         "message": f"{points} points added to user",
-        "new_balance": user.points_balance
+        "new_balance": new_balance
     }), 200
 
 
@@ -280,32 +330,125 @@ def get_admin_reports():
     if not is_admin:
         return jsonify({"success": False, "message": "Admin access required"}), 403
     
-    # Get recent admin actions
-    recent_actions = AdminAction.query.order_by(
-        AdminAction.created_at.desc()
-    ).limit(20).all()
+    # Get recent admin actions with their admin and item in one query
+    admin = aliased(User)
+    recent_actions = db.session.query(AdminAction, admin.username, Item.title).join(
+        admin, AdminAction.admin_id == admin.id
+    ).outerjoin(
+        Item, AdminAction.item_id == Item.id
+    ).order_by(AdminAction.created_at.desc()).limit(20).all()
     
     actions_data = []
-    for action in recent_actions:
-        admin = User.query.get(action.admin_id)
-        item = Item.query.get(action.item_id)
-        
+    for action, admin_username, item_title in recent_actions:
         actions_data.append({
             "id": action.id,
             "action": action.action,
             "reason": action.reason,
             "created_at": action.created_at.isoformat(),
             "admin": {
-                "id": admin.id,
-                "username": admin.username
+                "id": action.admin_id,
+                "username": admin_username
             },
             "item": {
-                "id": item.id,
-                "title": item.title
-            } if item else None
+                "id": action.item_id,
+                "title": item_title
+            } if item_title is not None else None
         })
     
     return jsonify({
         "success": True,
         "recent_actions": actions_data
     }), 200
+
+
+
+def parse_utc(value):
+    """ISO date or datetime as naive UTC, the form rollup buckets are stored in"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+@admin_bp.route('/analytics', methods=['GET'])
+@jwt_required()
+def get_analytics():
+    """Activity per hour or day and category over a date range, read from the rollups.
+
+    ``start`` and ``end`` are ISO dates or datetimes, UTC unless they carry
+    an offset, ``end`` exclusive; by default the last 30 days (or 48
+    hours). ``metric`` takes a comma separated list and ``category``
+    narrows to one category.
+    """
+    is_admin, user = check_admin()
+    if not is_admin:
+        return jsonify({"success": False, "message": "Admin access required"}), 403
+    
+    interval = request.args.get('interval', 'day')
+    if interval not in PERIODS:
+        return jsonify({"success": False, "message": "Interval must be hour or day"}), 400
+    step = PERIODS[interval]
+    
+    try:
+        end = request.args.get('end')
+        end = parse_utc(end) if end else bucket_start(datetime.utcnow(), interval) + step
+        start = request.args.get('start')
+        start = bucket_start(parse_utc(start) if start else end - step * (30 if interval == 'day' else 48), interval)
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid start or end date"}), 400
+    
+    if end <= start:
+        return jsonify({"success": False, "message": "End must be after start"}), 400
+    
+    if (end - start) / step > Config.ANALYTICS_MAX_BUCKETS:
+        return jsonify({
+            "success": False,
+            "message": f"At most {Config.ANALYTICS_MAX_BUCKETS} {interval}s per request"
+        }), 400
+    
+    metrics = [metric for metric in request.args.get('metric', '').split(',') if metric]
+    unknown = set(metrics) - set(METRICS)
+    if unknown:
+        return jsonify({"success": False, "message": f"Unknown metric, use any of {', '.join(METRICS)}"}), 400
+    
+    rows = load_activity(interval, start, end, metrics=metrics, category=request.args.get('category'))
+    
+    totals = dict.fromkeys(metrics or METRICS, 0)
+    for bucket, metric, category, count in rows:
+        totals[metric] += count
+    
+    return jsonify({
+        "success": True,
+        "interval": interval,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "series": [{
+            "bucket": bucket.isoformat(),
+            "metric": metric,
+            "category": category,
+            "count": count
+        } for bucket, metric, category, count in rows],
+        "totals": totals
+    }), 200
+
+@admin_bp.route('/export/<name>', methods=['GET'])
+@jwt_required()
+def export_table(name):
+    """Stream users, items, swaps or admin-actions as CSV or NDJSON"""
+    is_admin, user = check_admin()
+    if not is_admin:
+        return jsonify({"success": False, "message": "Admin access required"}), 403
+    
+    if name not in EXPORTS:
+        return jsonify({"success": False, "message": f"Unknown export, use one of {', '.join(EXPORTS)}"}), 404
+    
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in FORMATS:
+        return jsonify({"success": False, "message": "Format must be csv or ndjson"}), 400
+    
+    filename = f"{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.{export_format}"
+    return Response(
+        stream_with_context(export_rows(name, export_format)),
+        mimetype=FORMATS[export_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
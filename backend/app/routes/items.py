@@ -1,12 +1,28 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, current_app, redirect, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity, current_user
 from werkzeug.utils import secure_filename
 import os
+import re
 from app import db
-from app.models import Item, ItemImage, User
+from app.models import Item, ItemImage, ImageBlob, User, Swap
+from app.utils.facets import get_facets, invalidate_facets
+from app.utils.http_cache import (
+    bump_catalog_version, listing_etag, item_etag, is_not_modified, not_modified_response, cacheable
+)
+from app.utils.ingest import spool_files, enqueue_ingest
+from app.utils.matching import swaps_closed
+from app.utils.pagination import paginate_query
+from app.utils.rollups import record_activity
+from app.utils.search import apply_search
+from app.utils.serializers import serialize_item, serialize_items, UPLOADER_FIELDS
+from app.utils.stats import bump_counters, item_counters
+from app.utils.swaps import close_pending_swaps
+from app.utils.tags import set_item_tags, item_tag_ids, refresh_tag_counts, filter_by_tags, tag_facets
+from app.utils.images import store_deduplicated, ensure_derivative, DERIVATIVE_SIZES
 from config import Config
+from sqlalchemy import delete, or_
+from sqlalchemy.orm.exc import StaleDataError
 from datetime import datetime
-import cloudinary.uploader
 
 item_bp = Blueprint('items', __name__, url_prefix='/api/items')
 
@@ -16,9 +32,7 @@ def allowed_file(filename):
 @item_bp.route('/upload', methods=['POST'])
 @jwt_required()
 def upload_item():
-    print("=== /upload endpoint called ===")
     user_id = int(get_jwt_identity())
-    print("User ID:", user_id)
 
     # Collect form data
     name = request.form.get('name')
@@ -43,7 +57,7 @@ def upload_item():
             "missing_fields": missing_fields
         }), 400
 
-    # Upload main image to Cloudinary
+    # Upload main and additional images to Cloudinary concurrently
     main_image_file = request.files.get('mainImage')
     if not main_image_file or not allowed_file(main_image_file.filename):
         return jsonify({
@@ -51,52 +65,92 @@ def upload_item():
             "message": "Main image is required and must be valid"
         }), 400
 
-    try:
-        main_uploaded = cloudinary.uploader.upload(main_image_file)
-        main_image_url = main_uploaded.get('secure_url')
-    except Exception as e:
-        print("Cloudinary upload error:", str(e))
+    additional_files = [
+        file for file in request.files.getlist('additionalImages')
+        if file and allowed_file(file.filename)
+    ]
+
+    item = Item(
+        title=name,
+        category=category,
+        type=type_,
+        condition=condition,
+        description=description,
+        tags=tags,
+        size=size,
+        uploader_id=user_id,
+        approved=True,  # Auto-approve for development
+        created_at=datetime.utcnow()
+    )
+
+    # Ingest mode: spool the files and let the background workers store them
+    if request.form.get('ingest', Config.IMAGE_INGEST_MODE) == 'async':
+        try:
+            item.status = 'processing'
+            db.session.add(item)
+            set_item_tags(item, tags)
+            db.session.flush()
+            spool_files(item.id, [main_image_file] + additional_files)
+            bump_counters(item_counters(item))
+            record_activity([('items_listed', item.category, item.created_at)])
+            db.session.commit()
+        except Exception as e:
+            current_app.logger.error("Spooling failed: %s", e)
+            db.session.rollback()
+            return jsonify({
+                "success": False,
+                "message": "Failed to save item for processing",
+                "error": str(e)
+            }), 500
+
+        enqueue_ingest(item.id)
+        return jsonify({
+            "success": True,
+            "message": "Item accepted for processing",
+            "item": {
+                "id": item.id,
+                "status": item.status,
+                "status_url": f"/api/items/{item.id}/status"
+            }
+        }), 202
+
+    # Identical photos are stored once and reused by content hash
+    (main_image_url, main_hash, main_error), *additional_results = store_deduplicated([
+        (file.read(), file.filename) for file in [main_image_file] + additional_files
+    ])
+
+    if main_error:
+        current_app.logger.error("Main image upload failed: %s", main_error)
         return jsonify({
             "success": False,
             "message": "Failed to upload main image to Cloudinary",
-            "error": str(e)
+            "error": str(main_error)
         }), 500
 
+    additional_images = []
+    for image_url, image_hash, error in additional_results:
+        if error:
+            current_app.logger.warning("Additional image upload failed: %s", error)
+            continue
+        additional_images.append((image_url, image_hash))
+    additional_image_urls = [image_url for image_url, image_hash in additional_images]
+
     # === Save item only after successful main image upload ===
     try:
-        item = Item(
-            title=name,
-            category=category,
-            type=type_,
-            condition=condition,
-            description=description,
-            tags=tags,
-            size=size,
-            uploader_id=user_id,
-            approved=True,  # Auto-approve for development
-            created_at=datetime.utcnow()
-        )
         db.session.add(item)
-        db.session.commit()
+        set_item_tags(item, tags)
+        db.session.flush()
 
-        # Save main image URL
-        db.session.add(ItemImage(item_id=item.id, image_url=main_image_url))
-
-        # Upload additional images if present
-        additional_image_urls = []
-        additional_files = request.files.getlist('additionalImages')
-        for file in additional_files:
-            if file and allowed_file(file.filename):
-                try:
-                    uploaded = cloudinary.uploader.upload(file)
-                    image_url = uploaded.get('secure_url')
-                    db.session.add(ItemImage(item_id=item.id, image_url=image_url))
-                    additional_image_urls.append(image_url)
-                except Exception as e:
-                    print("Additional image upload failed:", str(e))
-                    continue
+        # Main image first, then additional images in upload order
+        for image_url, image_hash in [(main_image_url, main_hash)] + additional_images:
+            db.session.add(ItemImage(item_id=item.id, image_url=image_url, content_hash=image_hash))
 
+        refresh_tag_counts([tag.id for tag in item.tag_list])
+        bump_counters(item_counters(item))
+        record_activity([('items_listed', item.category, item.created_at)])
+        bump_catalog_version()
         db.session.commit()
+        invalidate_facets()
 
         return jsonify({
             "success": True,
@@ -109,14 +163,12 @@ def upload_item():
                 "mainImage": main_image_url,
                 "additionalImages": additional_image_urls,
                 "uploader": {
-                    "username": User.query.get(user_id).username
+                    "username": current_user.username
                 }
             }
         }), 201
     except Exception as e:
-        print("Database error:", str(e))
-        import traceback
-        traceback.print_exc()
+        current_app.logger.exception("Saving item failed: %s", e)
         return jsonify({
             "success": False,
             "message": "Failed to save item to database",
@@ -127,8 +179,10 @@ def upload_item():
 @item_bp.route('/', methods=['GET'])
 def get_items():
     """Get all approved items with filtering and pagination"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 12, type=int)
+    etag, last_modified = listing_etag()
+    if is_not_modified(etag, last_modified):
+        return cacheable(not_modified_response(), etag, last_modified)
+    
     category = request.args.get('category')
     search = request.args.get('search')
     show_all = request.args.get('show_all', 'false').lower() == 'true'  # Development flag
@@ -142,52 +196,21 @@ def get_items():
     if category:
         query = query.filter_by(category=category)
     
-    if search:
-        query = query.filter(
-            Item.title.ilike(f'%{search}%') | 
-            Item.description.ilike(f'%{search}%') |
-            Item.tags.ilike(f'%{search}%')
-        )
+    tags = request.args.getlist('tag')
+    if tags:
+        match_all = request.args.get('tag_mode', 'all').lower() != 'any'
+        query = filter_by_tags(query, tags, match_all=match_all)
     
-    items = query.order_by(Item.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    if search:
+        query = apply_search(query, search)
     
-    items_data = []
-    for item in items.items:
-        uploader = User.query.get(item.uploader_id)
-        images = [img.image_url for img in item.images]
-        
-        items_data.append({
-            "id": item.id,
-            "title": item.title,
-            "description": item.description,
-            "category": item.category,
-            "type": item.type,
-            "size": item.size,
-            "condition": item.condition,
-            "tags": item.tags,
-            "status": item.status,
-            "approved": item.approved,  # Include approval status for debugging
-            "created_at": item.created_at.isoformat(),
-            "uploader": {
-                "id": uploader.id,
-                "username": uploader.username,
-                "name": uploader.name
-            },
-            "images": images
-        })
+    items, pagination = paginate_query(query, Item, default_per_page=12)
     
-    return jsonify({
+    return cacheable(jsonify({
         "success": True,
-        "items": items_data,
-        "pagination": {
-            "page": page,
-            "per_page": per_page,
-            "total": items.total,
-            "pages": items.pages
-        }
-    }), 200
+        "items": serialize_items(items, image_size='card'),
+        "pagination": pagination
+    }), etag, last_modified)
 
 
 @item_bp.route('/<int:item_id>', methods=['GET'])
@@ -197,30 +220,61 @@ def get_item(item_id):
     if not item:
         return jsonify({"success": False, "message": "Item not found"}), 404
     
-    uploader = User.query.get(item.uploader_id)
-    images = [img.image_url for img in item.images]
+    etag, last_modified = item_etag(item, User.query.get(item.uploader_id))
+    if is_not_modified(etag, last_modified):
+        return cacheable(not_modified_response(), etag, last_modified)
+    
+    return cacheable(jsonify({
+        "success": True,
+        "item": serialize_item(
+            item, uploader_fields=UPLOADER_FIELDS + ('points_balance',)
+        )
+    }), etag, last_modified)
+
+
+@item_bp.route('/images/<content_hash>/<size>.jpg', methods=['GET'])
+def get_image_derivative(content_hash, size):
+    """Serve a downscaled copy of a stored image from the local cache"""
+    if size not in DERIVATIVE_SIZES or not re.fullmatch(r'[0-9a-f]{64}', content_hash):
+        return jsonify({"success": False, "message": "Image not found"}), 404
+    
+    try:
+        path = ensure_derivative(current_app._get_current_object(), content_hash, size)
+    except Exception as e:
+        current_app.logger.warning("Derivative %s for %s failed: %s", size, content_hash, e)
+        path = None
+    
+    if not path:
+        blob = ImageBlob.query.filter_by(content_hash=content_hash).first()
+        if not blob:
+            return jsonify({"success": False, "message": "Image not found"}), 404
+        # Could not render a derivative; fall back to the original
+        return redirect(blob.image_url)
+    
+    # Content-addressed, so the bytes behind this URL never change
+    return send_file(path, mimetype='image/jpeg', max_age=365 * 24 * 60 * 60)
+
+
+@item_bp.route('/<int:item_id>/status', methods=['GET'])
+@jwt_required()
+def get_item_status(item_id):
+    """Poll the processing status of an uploaded item"""
+    user_id = int(get_jwt_identity())
+    item = Item.query.get(item_id)
+    if not item:
+        return jsonify({"success": False, "message": "Item not found"}), 404
+    
+    if item.uploader_id != user_id and not current_user.is_admin:
+        return jsonify({"success": False, "message": "Unauthorized"}), 403
     
+    image_count = ItemImage.query.filter_by(item_id=item.id).count()
     return jsonify({
         "success": True,
         "item": {
             "id": item.id,
-            "title": item.title,
-            "description": item.description,
-            "category": item.category,
-            "type": item.type,
-            "size": item.size,
-            "condition": item.condition,
-            "tags": item.tags,
             "status": item.status,
-            "approved": item.approved,
-            "created_at": item.created_at.isoformat(),
-            "uploader": {
-                "id": uploader.id,
-                "username": uploader.username,
-                "name": uploader.name,
-                "points_balance": uploader.points_balance
-            },
-            "images": images
+            "ready": item.status not in ('processing', 'failed'),
+            "image_count": image_count
         }
     }), 200
 
@@ -231,41 +285,57 @@ def get_my_items():
     """Get items uploaded by the current user"""
     user_id = int(get_jwt_identity())
     
-    items = Item.query.filter_by(uploader_id=user_id).order_by(Item.created_at.desc()).all()
-    
-    items_data = []
-    for item in items:
-        images = [img.image_url for img in item.images]
-        
-        items_data.append({
-            "id": item.id,
-            "title": item.title,
-            "description": item.description,
-            "category": item.category,
-            "type": item.type,
-            "size": item.size,
-            "condition": item.condition,
-            "tags": item.tags,
-            "status": item.status,
-            "approved": item.approved,
-            "created_at": item.created_at.isoformat(),
-            "images": images
-        })
+    items, pagination = paginate_query(
+        Item.query.filter_by(uploader_id=user_id), Item, default_per_page=50
+    )
     
     return jsonify({
         "success": True,
-        "items": items_data
+        "items": serialize_items(items, with_uploader=False, image_size='card'),
+        "pagination": pagination
     }), 200
 
 
 @item_bp.route('/categories', methods=['GET'])
 def get_categories():
-    """Get all available categories"""
-    categories = db.session.query(Item.category).distinct().all()
-    return jsonify({
+    """Get all categories that have listed items"""
+    etag, last_modified = listing_etag()
+    if is_not_modified(etag, last_modified):
+        return cacheable(not_modified_response(), etag, last_modified)
+    
+    categories = get_facets()['category']
+    return cacheable(jsonify({
         "success": True,
-        "categories": [cat[0] for cat in categories if cat[0]]
-    }), 200
+        "categories": [category['value'] for category in categories],
+        "counts": {category['value']: category['count'] for category in categories}
+    }), etag, last_modified)
+
+
+@item_bp.route('/facets', methods=['GET'])
+def get_item_facets():
+    """Get listed-item counts by category, condition, size and type"""
+    etag, last_modified = listing_etag()
+    if is_not_modified(etag, last_modified):
+        return cacheable(not_modified_response(), etag, last_modified)
+    
+    return cacheable(jsonify({
+        "success": True,
+        "facets": get_facets()
+    }), etag, last_modified)
+
+
+@item_bp.route('/tags', methods=['GET'])
+def get_tags():
+    """Get tag facets with the number of listed items for each"""
+    etag, last_modified = listing_etag()
+    if is_not_modified(etag, last_modified):
+        return cacheable(not_modified_response(), etag, last_modified)
+    
+    limit = max(1, min(request.args.get('limit', 50, type=int), Config.MAX_PER_PAGE))
+    return cacheable(jsonify({
+        "success": True,
+        "tags": tag_facets(limit=limit, prefix=request.args.get('prefix'))
+    }), etag, last_modified)
 
 
 @item_bp.route('/<int:item_id>', methods=['DELETE'])
@@ -274,14 +344,13 @@ def delete_item(item_id):
     """Delete an item (only by the uploader or admin)"""
     try:
         user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
         item = Item.query.get(item_id)
         
         if not item:
             return jsonify({"success": False, "message": "Item not found"}), 404
         
         # Check if user is the uploader or an admin
-        if item.uploader_id != user_id and not user.is_admin:
+        if item.uploader_id != user_id and not current_user.is_admin:
             return jsonify({"success": False, "message": "Unauthorized to delete this item"}), 403
         
         # Delete associated images from Cloudinary (optional)
@@ -294,21 +363,38 @@ def delete_item(item_id):
                     # In production, you might want to store public_id separately
                     pass  # For now, we'll skip Cloudinary deletion to avoid errors
             except Exception as e:
-                print(f"Error deleting image from Cloudinary: {e}")
+                current_app.logger.warning("Deleting image from Cloudinary failed: %s", e)
+        
+        # Refund open requests, then remove the item's swaps explicitly so
+        # the counters stay right whether or not the database cascades
+        involves_item = or_(Swap.requested_item_id == item.id, Swap.offered_item_id == item.id)
+        close_pending_swaps(involves_item, status='cancelled')
+        removed_swaps = db.session.execute(
+            delete(Swap).where(involves_item).returning(Swap.id, Swap.status),
+            execution_options={"synchronize_session": False}
+        ).all()
         
         # Delete the item (cascading will handle related records)
+        tag_ids = item_tag_ids([item.id])
+        changes = item_counters(item, sign=-1)
+        changes['swaps'] = -len(removed_swaps)
+        changes['swaps_completed'] = -sum(1 for swap_id, status in removed_swaps if status == 'accepted')
         db.session.delete(item)
+        try:
+            db.session.flush()
+        except StaleDataError:
+            db.session.rollback()
+            return jsonify({"success": False, "message": "Item was changed by another request"}), 409
+        refresh_tag_counts(tag_ids)
+        bump_counters(changes)
+        bump_catalog_version()
         db.session.commit()
+        swaps_closed([swap_id for swap_id, status in removed_swaps])
+        invalidate_facets()
         
         return jsonify({"success": True, "message": "Item deleted successfully"}), 200
         
     except Exception as e:
-        print("Delete item error:", str(e))
-        import traceback
-        traceback.print_exc()
+        current_app.logger.exception("Deleting item %s failed: %s", item_id, e)
         db.session.rollback()
-        return jsonify({
-            "success": False,
-            "message": "Failed to delete item",
-            "error": str(e)
-        }), 500
+        return jsonify({"success": False, "message": "Failed to delete item"}), 500
@@ -1,7 +1,21 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
-from app.models import Swap, Redemption, Item, User
+from app.models import Swap, Redemption, Item
+from app.utils.events import publish_swap_events, event_stream
+from app.utils.facets import invalidate_facets
+from app.utils.http_cache import bump_catalog_version
+from app.utils.matching import swaps_opened, swaps_closed, suggest_cycles
+from app.utils.pagination import paginate_query
+from app.utils.points import debit_points, refund_swaps, InsufficientPoints
+from app.utils.rollups import record_activity
+from app.utils.serializers import serialize_swaps, swap_item_summary, load_users
+from app.utils.stats import bump_counters
+from app.utils.swaps import reject_competing_swaps, respond_in_bulk, SwapConflict
+from app.utils.tags import item_tag_ids, refresh_tag_counts
+from sqlalchemy import update
+from sqlalchemy.orm.exc import StaleDataError
+from config import Config
 from datetime import datetime
 
 swap_bp = Blueprint('swap', __name__, url_prefix='/api/swap')
@@ -22,6 +36,9 @@ def create_swap_request():
     offered_item_id = data.get('offered_item_id')
     points_used = data.get('points_used', 0)
     
+    if not isinstance(points_used, int) or points_used < 0:
+        return jsonify({"success": False, "message": "Points must be a non-negative integer"}), 400
+    
     # Validate requested item
     requested_item = Item.query.get(requested_item_id)
     if not requested_item:
@@ -48,34 +65,41 @@ def create_swap_request():
         if offered_item.status != 'available':
             return jsonify({"success": False, "message": "Offered item is not available"}), 400
     
-    elif swap_type == 'points':
-        user = User.query.get(user_id)
-        if user.points_balance < points_used:
-            return jsonify({"success": False, "message": "Insufficient points"}), 400
-        
-        # Create redemption record
-        redemption = Redemption(
-            user_id=user_id,
-            item_id=requested_item_id,
-            points_used=points_used,
-            status='pending'
-        )
-        db.session.add(redemption)
-        
-        # Deduct points
-        user.points_balance -= points_used
-    
     # Create swap request
     swap = Swap(
         requester_id=user_id,
         requested_item_id=requested_item_id,
-        offered_item_id=offered_item_id,
+        offered_item_id=offered_item_id if swap_type == 'direct' else None,
         swap_type=swap_type,
         status='pending'
     )
-    
     db.session.add(swap)
+    
+    if swap_type == 'points':
+        db.session.flush()
+        
+        # Deduct points; the UPDATE only matches while the balance covers them
+        try:
+            if points_used:
+                debit_points(user_id, points_used, 'swap_hold', swap_id=swap.id)
+        except InsufficientPoints:
+            db.session.rollback()
+            return jsonify({"success": False, "message": "Insufficient points"}), 400
+        
+        # Create redemption record
+        db.session.add(Redemption(
+            user_id=user_id,
+            item_id=requested_item_id,
+            swap_id=swap.id,
+            points_used=points_used,
+            status='pending'
+        ))
+    
+    bump_counters({'swaps': 1})
+    record_activity([('swaps_requested', requested_item.category, None)])
     db.session.commit()
+    swaps_opened([(swap.id, user_id, requested_item.uploader_id, requested_item_id)])
+    publish_swap_events('swap_created', [swap.id])
     
     return jsonify({
         "success": True,
@@ -109,38 +133,63 @@ def respond_to_swap(swap_id):
     if swap.status != 'pending':
         return jsonify({"success": False, "message": "Swap request already processed"}), 400
     
+    closed_swap_ids = [swap.id]
     if action == 'accept':
+        if requested_item.status != 'available':
+            return jsonify({"success": False, "message": "Item is no longer available"}), 409
+        
+        offered_item = Item.query.get(swap.offered_item_id) if swap.offered_item_id else None
+        if offered_item and offered_item.status != 'available':
+            return jsonify({"success": False, "message": "Offered item is no longer available"}), 409
+        
+        # Versioned rows: the flush only matches if nobody changed them since we read them
         swap.status = 'accepted'
         requested_item.status = 'swapped'
-        
-        if swap.offered_item_id:
-            offered_item = Item.query.get(swap.offered_item_id)
+        if offered_item:
             offered_item.status = 'swapped'
         
+        try:
+            db.session.flush()
+        except StaleDataError:
+            db.session.rollback()
+            return jsonify({"success": False, "message": "Swap request was changed by another request"}), 409
+        
         # Handle points redemption
         if swap.swap_type == 'points':
-            redemption = Redemption.query.filter_by(
-                user_id=swap.requester_id,
-                item_id=swap.requested_item_id
-            ).first()
-            if redemption:
-                redemption.status = 'completed'
+            db.session.execute(
+                update(Redemption).where(
+                    Redemption.swap_id == swap.id,
+                    Redemption.status == 'pending'
+                ).values(status='completed')
+            )
+        
+        # The item is gone, so every other pending request for it loses
+        closed_swap_ids += reject_competing_swaps(swap)
+        
+        refresh_tag_counts(item_tag_ids([swap.requested_item_id, swap.offered_item_id]))
+        bump_counters({'swaps_completed': 1})
+        record_activity([('swaps_accepted', requested_item.category, None)])
+        bump_catalog_version()
     
     else:  # reject
         swap.status = 'rejected'
         
+        try:
+            db.session.flush()
+        except StaleDataError:
+            db.session.rollback()
+            return jsonify({"success": False, "message": "Swap request was changed by another request"}), 409
+        
         # Refund points if it was a points swap
         if swap.swap_type == 'points':
-            redemption = Redemption.query.filter_by(
-                user_id=swap.requester_id,
-                item_id=swap.requested_item_id
-            ).first()
-            if redemption:
-                user = User.query.get(swap.requester_id)
-                user.points_balance += redemption.points_used
-                redemption.status = 'cancelled'
+            refund_swaps([swap.id])
     
     db.session.commit()
+    swaps_closed(closed_swap_ids)
+    publish_swap_events('swap_responded', closed_swap_ids)
+    
+    if action == 'accept':
+        invalidate_facets()
     
     return jsonify({
         "success": True,
@@ -148,41 +197,95 @@ def respond_to_swap(swap_id):
     }), 200
 
 
+@swap_bp.route('/respond', methods=['POST'])
+@jwt_required()
+def respond_to_swaps():
+    """Accept or reject many received swap requests in one transaction"""
+    user_id = int(get_jwt_identity())
+    data = request.get_json()
+    
+    entries = data.get('swaps') if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"success": False, "message": "List of swaps required"}), 400
+    
+    if len(entries) > Config.MAX_BATCH_SIZE:
+        return jsonify({
+            "success": False,
+            "message": f"At most {Config.MAX_BATCH_SIZE} swaps per request"
+        }), 400
+    
+    if not all(isinstance(entry, dict) and isinstance(entry.get('swap_id'), int)
+               and entry.get('action') in ('accept', 'reject') for entry in entries):
+        return jsonify({
+            "success": False,
+            "message": "Each entry needs a swap_id and an action of accept or reject"
+        }), 400
+    
+    responses = [(entry['swap_id'], entry['action']) for entry in entries]
+    
+    # A concurrent change fails the compare-and-set; start over from fresh state
+    for _ in range(3):
+        try:
+            results, swapped_item_ids, closed_swap_ids = respond_in_bulk(user_id, responses)
+            if swapped_item_ids:
+                # Swaps and items are still in the identity map, so these gets need no SQL
+                accepted = [db.session.get(Swap, result['swap_id']) for result in results if result.get('status') == 'accepted']
+                refresh_tag_counts(item_tag_ids(swapped_item_ids))
+                bump_counters({'swaps_completed': len(accepted)})
+                record_activity(('swaps_accepted', db.session.get(Item, swap.requested_item_id).category, None)
+                                for swap in accepted)
+                bump_catalog_version()
+            db.session.commit()
+            break
+        except SwapConflict:
+            db.session.rollback()
+    else:
+        return jsonify({"success": False, "message": "Swap requests changed by another request, try again"}), 409
+    
+    swaps_closed(closed_swap_ids)
+    publish_swap_events('swap_responded', closed_swap_ids)
+    if swapped_item_ids:
+        invalidate_facets()
+    
+    return jsonify({
+        "success": True,
+        "results": results,
+        "accepted": sum(1 for result in results if result.get('status') == 'accepted'),
+        "rejected": sum(1 for result in results if result.get('status') == 'rejected'),
+        "failed": sum(1 for result in results if not result['success'])
+    }), 200
+
+
+@swap_bp.route('/events', methods=['GET'])
+@jwt_required()
+def swap_events():
+    """Stream swap_created and swap_responded events for the user's swaps.
+
+    Meant for EventSource, which sends the JWT cookie but cannot set headers.
+    """
+    user_id = int(get_jwt_identity())
+    
+    return Response(event_stream(user_id), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # let proxies pass events straight through
+    })
+
+
 @swap_bp.route('/my-requests', methods=['GET'])
 @jwt_required()
 def get_my_swap_requests():
     user_id = int(get_jwt_identity())
     
-    swaps = Swap.query.filter_by(requester_id=user_id).all()
+    swaps, pagination = paginate_query(
+        Swap.query.filter_by(requester_id=user_id), Swap, default_per_page=50
+    )
     
-    swap_data = []
-    for swap in swaps:
-        requested_item = Item.query.get(swap.requested_item_id)
-        offered_item = Item.query.get(swap.offered_item_id) if swap.offered_item_id else None
-        
-        swap_data.append({
-            "id": swap.id,
-            "swap_type": swap.swap_type,
-            "status": swap.status,
-            "created_at": swap.created_at.isoformat(),
-            "requested_item": {
-                "id": requested_item.id,
-                "title": requested_item.title,
-                "category": requested_item.category,
-                "condition": requested_item.condition,
-                "uploader": User.query.get(requested_item.uploader_id).username
-            },
-            "offered_item": {
-                "id": offered_item.id,
-                "title": offered_item.title,
-                "category": offered_item.category,
-                "condition": offered_item.condition
-            } if offered_item else None
-        })
+    swap_data = serialize_swaps(swaps, with_owner=True)
     
     return jsonify({
         "success": True,
-        "swaps": swap_data
+        "swaps": swap_data,
+        "pagination": pagination
     }), 200
 
 
@@ -192,42 +295,48 @@ def get_received_swap_requests():
     user_id = int(get_jwt_identity())
     
     # Get swaps where user owns the requested item
-    swaps = db.session.query(Swap).join(Item, Swap.requested_item_id == Item.id).filter(
+    query = db.session.query(Swap).join(Item, Swap.requested_item_id == Item.id).filter(
         Item.uploader_id == user_id,
         Swap.status == 'pending'
-    ).all()
+    )
+    swaps, pagination = paginate_query(query, Swap, default_per_page=50)
     
-    swap_data = []
-    for swap in swaps:
-        requested_item = Item.query.get(swap.requested_item_id)
-        offered_item = Item.query.get(swap.offered_item_id) if swap.offered_item_id else None
-        requester = User.query.get(swap.requester_id)
-        
-        swap_data.append({
-            "id": swap.id,
-            "swap_type": swap.swap_type,
-            "status": swap.status,
-            "created_at": swap.created_at.isoformat(),
-            "requester": {
-                "id": requester.id,
-                "username": requester.username,
-                "name": requester.name
-            },
-            "requested_item": {
-                "id": requested_item.id,
-                "title": requested_item.title,
-                "category": requested_item.category,
-                "condition": requested_item.condition
-            },
-            "offered_item": {
-                "id": offered_item.id,
-                "title": offered_item.title,
-                "category": offered_item.category,
-                "condition": offered_item.condition
-            } if offered_item else None
-        })
+    swap_data = serialize_swaps(swaps, with_requester=True)
+    
+    return jsonify({
+        "success": True,
+        "swaps": swap_data,
+        "pagination": pagination
+    }), 200
+
+
+@swap_bp.route('/cycles', methods=['GET'])
+@jwt_required()
+def get_swap_cycles():
+    """Suggest trade cycles that would satisfy the user's pending requests"""
+    user_id = int(get_jwt_identity())
+    limit = max(1, min(request.args.get('limit', 10, type=int), Config.MAX_PER_PAGE))
+    
+    cycles = suggest_cycles(user_id, limit=limit)
+    
+    steps = [step for cycle in cycles for step in cycle]
+    items = {item.id: item for item in Item.query.filter(
+        Item.id.in_({step['item_id'] for step in steps})
+    ).all()} if steps else {}
+    users = load_users(step['user_id'] for step in steps)
     
     return jsonify({
         "success": True,
-        "swaps": swap_data
+        "cycles": [{
+            "length": len(cycle),
+            "steps": [{
+                "swap_id": step['swap_id'],
+                "user": {
+                    "id": step['user_id'],
+                    "username": users[step['user_id']].username if step['user_id'] in users else None
+                },
+                "from_user_id": step['from_user_id'],
+                "item": swap_item_summary(items.get(step['item_id']))
+            } for step in cycle]
+        } for cycle in cycles]
     }), 200
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import jsonify
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from app import db
+from app.models import User
+from config import Config
+
+
+# What handlers read about the signed-in user; immutable, so one copy can serve every request
+CachedUser = namedtuple('CachedUser', ['id', 'username', 'name', 'email', 'is_admin', 'points_balance', 'profile_picture'])
+
+_lock = threading.Lock()
+_users = OrderedDict()  # user_id -> (expires, CachedUser), least recently used first
+_state = {'generation': 0}
+
+
+def get_cached_user(user_id):
+    """The user as a CachedUser, from the cache for up to USER_CACHE_TTL seconds"""
+    now = time.monotonic()
+    with _lock:
+        entry = _users.get(user_id)
+        if entry and entry[0] > now:
+            _users.move_to_end(user_id)
+            return entry[1]
+        generation = _state['generation']
+
+    row = db.session.execute(
+        select(*(getattr(User, field) for field in CachedUser._fields)).where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+    user = CachedUser(*row)
+
+    with _lock:
+        # Skip storing if an invalidation ran while we were reading; it may be newer than our row
+        if _state['generation'] == generation:
+            _users[user_id] = (now + Config.USER_CACHE_TTL, user)
+            _users.move_to_end(user_id)
+            while len(_users) > Config.USER_CACHE_SIZE:
+                _users.popitem(last=False)
+    return user
+
+
+def _drop(user_ids):
+    with _lock:
+        _state['generation'] += 1
+        for user_id in user_ids:
+            _users.pop(user_id, None)
+
+
+def invalidate_users(user_ids):
+    """Forget cached users whose row the current transaction changes.
+
+    They are dropped now and again once the transaction ends, so a
+    request that reads the old row in between cannot cache it.
+    """
+    user_ids = set(user_ids)
+    _drop(user_ids)
+    db.session.info.setdefault('invalidated_users', set()).update(user_ids)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _drop_after_transaction(session, transaction):
+    # Only the outermost transaction; savepoints inside it end first
+    if transaction.parent is None:
+        user_ids = session.info.pop('invalidated_users', None)
+        if user_ids:
+            _drop(user_ids)
+
+
+def load_user(jwt_header, jwt_data):
+    """user_lookup_loader: makes ``current_user`` the token's CachedUser"""
+    return get_cached_user(int(jwt_data['sub']))
+
+
+def user_not_found(jwt_header, jwt_data):
+    return jsonify({"success": False, "message": "User not found"}), 401
@@ -0,0 +1,26 @@
+import threading
+
+
+def start_when_serving(app, *starters):
+    """Run each ``starter(app)`` once, when the app handles its first request.
+
+    Threads started this way never run in CLI commands or the reloader's
+    parent process, and with a preloading server they start in each worker
+    rather than dying in the fork. They are skipped under TESTING, and
+    BACKGROUND_THREADS=false turns them off everywhere.
+    """
+    lock = threading.Lock()
+    state = {'started': False}
+
+    def start():
+        if state['started']:
+            return
+        with lock:
+            if state['started']:
+                return
+            state['started'] = True
+        if app.config['BACKGROUND_THREADS'] and not app.testing:
+            for starter in starters:
+                starter(app)
+
+    app.before_request(start)
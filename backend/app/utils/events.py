@@ -0,0 +1,203 @@
+import itertools
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, insert, delete, func
+from app import db
+from app.models import Swap, Item, SwapEvent
+from config import Config
+
+
+# Connected event streams in this process: user_id -> set of queues
+_lock = threading.Lock()
+_subscribers = {}
+_broker = {'broker': None}
+
+
+class MemoryBroker:
+    """Delivers events inside this process only; enough for a single worker"""
+
+    def __init__(self):
+        self.ids = itertools.count(1)
+
+    def start(self, app, deliver):
+        self.deliver = deliver
+
+    def publish(self, events):
+        for event in events:
+            self.deliver(dict(event, id=next(self.ids)))
+
+
+class DatabaseBroker:
+    """Shares events between worker processes through the swap_events table.
+
+    Every process polls for rows newer than the last one it saw and
+    delivers them to its own subscribers. A stand-in for a real message
+    broker that needs nothing beyond the app database; rows older than
+    EVENT_RETENTION seconds are pruned while polling.
+    """
+
+    def __init__(self, poll_interval=None):
+        self.poll_interval = Config.EVENT_POLL_INTERVAL if poll_interval is None else poll_interval
+
+    def start(self, app, deliver):
+        with app.app_context():
+            self.engine = db.engine
+        self.deliver = deliver
+
+    def start_polling(self, app):
+        with self.engine.connect() as connection:
+            self.last_id = connection.execute(select(func.max(SwapEvent.id))).scalar() or 0
+        threading.Thread(target=self.poll_forever, args=(app, self.deliver), name='event-poller', daemon=True).start()
+
+    def publish(self, events):
+        now = datetime.utcnow()
+        with self.engine.begin() as connection:
+            connection.execute(insert(SwapEvent), [{
+                "type": event['type'],
+                "user_ids": json.dumps(event['user_ids']),
+                "payload": json.dumps(event['data']),
+                "created_at": now
+            } for event in events])
+
+    def poll_forever(self, app, deliver):
+        for polls in itertools.count():
+            time.sleep(self.poll_interval)
+            try:
+                with self.engine.begin() as connection:
+                    if not _subscribers:
+                        # Nobody to deliver to; skip ahead instead of replaying later
+                        self.last_id = connection.execute(select(func.max(SwapEvent.id))).scalar() or self.last_id
+                    else:
+                        rows = connection.execute(
+                            select(SwapEvent.id, SwapEvent.type, SwapEvent.user_ids, SwapEvent.payload)
+                            .where(SwapEvent.id > self.last_id).order_by(SwapEvent.id)
+                        ).all()
+                        for event_id, event_type, user_ids, payload in rows:
+                            deliver({"id": event_id, "type": event_type,
+                                     "user_ids": json.loads(user_ids), "data": json.loads(payload)})
+                            self.last_id = event_id
+
+                    if polls % 60 == 0:
+                        cutoff = datetime.utcnow() - timedelta(seconds=Config.EVENT_RETENTION)
+                        connection.execute(delete(SwapEvent).where(SwapEvent.created_at < cutoff))
+            except Exception as e:
+                app.logger.error("Event poll failed: %s", e)
+
+
+def set_broker(broker, app):
+    """Route published events through ``broker``.
+
+    A broker has ``start(app, deliver)``, called once, and
+    ``publish(events)``; it must end up calling ``deliver(event)`` in every
+    worker process, with an ``id`` added to each event. A broker that needs
+    a background thread to receive events starts it in an optional
+    ``start_polling(app)``, which only runs in serving processes.
+    """
+    broker.start(app, deliver)
+    _broker['broker'] = broker
+
+
+def start_event_polling(app):
+    """Start the broker's receiving thread, if it has one"""
+    broker = _broker['broker']
+    if hasattr(broker, 'start_polling'):
+        broker.start_polling(app)
+
+
+def configure_events(app):
+    """Select the broker named by EVENT_BROKER ('memory' or 'database')"""
+    if app.config['EVENT_BROKER'] == 'database':
+        set_broker(DatabaseBroker(), app)
+    else:
+        set_broker(MemoryBroker(), app)
+
+
+def deliver(event):
+    """Hand an event to the streams of its recipients connected to this process"""
+    with _lock:
+        targets = [(user_id, events) for user_id in event['user_ids'] for events in _subscribers.get(user_id, ())]
+    for user_id, events in targets:
+        try:
+            events.put_nowait(event)
+        except queue.Full:
+            # A stream this far behind is stuck; close it and let the client reconnect
+            unsubscribe(user_id, events)
+            # Drain through the queue's own locking; the stream may be reading it right now
+            while True:
+                try:
+                    events.get_nowait()
+                except queue.Empty:
+                    break
+            events.put_nowait(None)
+
+
+def subscribe(user_id):
+    events = queue.Queue(maxsize=Config.EVENT_QUEUE_SIZE)
+    with _lock:
+        _subscribers.setdefault(user_id, set()).add(events)
+    return events
+
+
+def unsubscribe(user_id, events):
+    with _lock:
+        streams = _subscribers.get(user_id)
+        if streams:
+            streams.discard(events)
+            if not streams:
+                del _subscribers[user_id]
+
+
+def publish_swap_events(event_type, swap_ids):
+    """Notify both sides of each swap; call after committing the change.
+
+    Loads the swaps with their item owners in one query and publishes
+    them as one batch. Failures are logged rather than raised, since the
+    change itself is already saved.
+    """
+    if not swap_ids or _broker['broker'] is None:
+        return
+
+    rows = db.session.query(Swap, Item.uploader_id).join(
+        Item, Swap.requested_item_id == Item.id
+    ).filter(Swap.id.in_(swap_ids)).all()
+
+    events = [{
+        "type": event_type,
+        "user_ids": [swap.requester_id, owner_id],
+        "data": {
+            "swap_id": swap.id,
+            "status": swap.status,
+            "swap_type": swap.swap_type,
+            "requested_item_id": swap.requested_item_id,
+            "offered_item_id": swap.offered_item_id,
+            "requester_id": swap.requester_id,
+            "owner_id": owner_id
+        }
+    } for swap, owner_id in rows]
+
+    try:
+        _broker['broker'].publish(events)
+    except Exception as e:
+        current_app.logger.error("Publishing %s events failed: %s", event_type, e)
+
+
+def event_stream(user_id):
+    """Server-sent events for one user, with comment keepalives while idle"""
+    events = subscribe(user_id)
+    try:
+        yield f"retry: {Config.SSE_RETRY_MS}\n\n"
+        while True:
+            try:
+                event = events.get(timeout=Config.SSE_KEEPALIVE)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                return
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+    finally:
+        unsubscribe(user_id, events)
@@ -0,0 +1,104 @@
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from app import db
+from app.models import User, Item, Swap, AdminAction
+from config import Config
+
+
+def _users():
+    return User.id, select(
+        User.id, User.username, User.name, User.email, User.is_admin, User.points_balance, User.created_at
+    )
+
+
+def _items():
+    return Item.id, select(
+        Item.id, Item.title, Item.category, Item.type, Item.size, Item.condition, Item.status,
+        Item.approved, Item.uploader_id, User.username.label('uploader'), Item.created_at, Item.updated_at
+    ).join(User, Item.uploader_id == User.id)
+
+
+def _swaps():
+    return Swap.id, select(
+        Swap.id, Swap.requester_id, Swap.requested_item_id, Swap.offered_item_id, Swap.swap_type,
+        Swap.status, Swap.created_at, Swap.updated_at
+    )
+
+
+def _admin_actions():
+    admin = aliased(User)
+    return AdminAction.id, select(
+        AdminAction.id, AdminAction.admin_id, admin.username.label('admin'), AdminAction.item_id,
+        Item.title.label('item_title'), AdminAction.action, AdminAction.reason, AdminAction.created_at
+    ).join(admin, AdminAction.admin_id == admin.id).outerjoin(Item, AdminAction.item_id == Item.id)
+
+
+# Export name -> builder returning (primary key, SELECT); the SELECT's labels are the columns
+EXPORTS = {
+    'users': _users,
+    'items': _items,
+    'swaps': _swaps,
+    'admin-actions': _admin_actions,
+}
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+# Leading characters that make a spreadsheet read a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _value(value, export_format='ndjson'):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if export_format == 'csv' and isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Users write titles, usernames and reasons; keep them as text when opened in a spreadsheet
+        return "'" + value
+    return value
+
+
+def _format_rows(columns, rows, export_format):
+    if export_format == 'ndjson':
+        return ''.join(
+            json.dumps({column: _value(value) for column, value in zip(columns, row)}) + '\n'
+            for row in rows
+        )
+    output = io.StringIO()
+    csv.writer(output).writerows([_value(value, 'csv') for value in row] for row in rows)
+    return output.getvalue()
+
+
+def export_rows(name, export_format):
+    """Yield an export as text chunks, in constant memory.
+
+    Rows are read in primary-key order, EXPORT_CHUNK_ROWS at a time. Each
+    chunk is one short query streamed from a server-side cursor
+    (``yield_per``), and the read transaction ends between chunks, so a
+    long download never pins a snapshot or a connection for its whole
+    duration. Run it inside stream_with_context.
+    """
+    primary_key, statement = EXPORTS[name]()
+    columns = list(statement.selected_columns.keys())
+
+    if export_format == 'csv':
+        yield _format_rows(columns, [columns], 'csv')
+
+    last_id = 0
+    while True:
+        result = db.session.execute(
+            statement.where(primary_key > last_id).order_by(primary_key).limit(Config.EXPORT_CHUNK_ROWS)
+            .execution_options(yield_per=Config.EXPORT_YIELD_PER)
+        )
+        count = 0
+        for rows in result.partitions():
+            count += len(rows)
+            last_id = rows[-1][0]
+            yield _format_rows(columns, rows, export_format)
+        db.session.rollback()
+
+        if count < Config.EXPORT_CHUNK_ROWS:
+            return
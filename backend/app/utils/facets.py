@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import Counter
+from sqlalchemy import func
+from app import db
+from app.models import Item
+from app.utils.http_cache import get_catalog_version
+from config import Config
+
+
+FACET_FIELDS = ('category', 'condition', 'size', 'type')
+
+_lock = threading.Lock()
+_cache = {'facets': None, 'version': None, 'expires': 0.0}
+
+
+def compute_facets():
+    """Count listed items per category, condition, size and type in one query"""
+    rows = db.session.query(
+        Item.category, Item.condition, Item.size, Item.type, func.count(Item.id)
+    ).filter(
+        Item.approved.is_(True),
+        Item.status == 'available'
+    ).group_by(Item.category, Item.condition, Item.size, Item.type).all()
+
+    counters = {field: Counter() for field in FACET_FIELDS}
+    for *values, count in rows:
+        for field, value in zip(FACET_FIELDS, values):
+            if value:
+                counters[field][value] += count
+
+    return {
+        field: [
+            {"value": value, "count": count}
+            for value, count in sorted(counter.items(), key=lambda entry: (-entry[1], entry[0]))
+        ]
+        for field, counter in counters.items()
+    }
+
+
+def get_facets():
+    """Cached facet counts, for the current catalog version.
+
+    Catalog writes bump the shared catalog_version row, which every worker
+    checks here, so no worker serves counts older than the listing ETag
+    they go out under. invalidate_facets() frees the writer's copy at
+    once; the TTL is only a backstop.
+    """
+    # Usually already in the identity map from listing_etag(), so no query
+    version = get_catalog_version()[0]
+    facets = _cache['facets']
+    if facets is not None and _cache['version'] == version and time.monotonic() < _cache['expires']:
+        return facets
+
+    with _lock:
+        if _cache['facets'] is None or _cache['version'] != version or time.monotonic() >= _cache['expires']:
+            _cache['facets'] = compute_facets()
+            _cache['version'] = version
+            _cache['expires'] = time.monotonic() + Config.FACET_CACHE_TTL
+        return _cache['facets']
+
+
+def invalidate_facets():
+    """Drop the cached facets; call after committing a catalog change"""
+    with _lock:
+        _cache['facets'] = None
@@ -0,0 +1,76 @@
+import hashlib
+from datetime import datetime, timezone
+from flask import request, current_app
+from sqlalchemy import update
+from app import db
+from app.models import CatalogVersion
+from config import Config
+
+
+CATALOG_ROW_ID = 1
+
+
+def bump_catalog_version():
+    """Mark the catalog as changed; call inside the writing transaction"""
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(CatalogVersion).where(CatalogVersion.id == CATALOG_ROW_ID).values(
+            version=CatalogVersion.version + 1,
+            updated_at=now
+        ),
+        execution_options={"synchronize_session": False}
+    )
+    if not result.rowcount:
+        db.session.add(CatalogVersion(id=CATALOG_ROW_ID, version=1, updated_at=now))
+
+
+def get_catalog_version():
+    """Current catalog version and the time it last changed"""
+    row = db.session.get(CatalogVersion, CATALOG_ROW_ID)
+    if not row:
+        return 0, None
+    return row.version, row.updated_at
+
+
+def make_etag(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def listing_etag():
+    """ETag for a listing: the catalog version plus the full query string"""
+    version, last_modified = get_catalog_version()
+    return make_etag('catalog', version, request.full_path), last_modified
+
+
+def item_etag(item, uploader):
+    """ETag for a single item, including the uploader fields it shows"""
+    return make_etag(
+        'item', item.id, item.updated_at, item.status, item.approved,
+        uploader.username if uploader else None,
+        uploader.name if uploader else None,
+        uploader.points_balance if uploader else None
+    ), item.updated_at
+
+
+def is_not_modified(etag, last_modified):
+    """True when the client's cached copy is still current"""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified:
+        modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+        return modified <= request.if_modified_since
+    return False
+
+
+def not_modified_response():
+    return current_app.response_class(status=304)
+
+
+def cacheable(response, etag, last_modified, max_age=None):
+    """Attach validators and public Cache-Control headers to a response"""
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    response.cache_control.public = True
+    response.cache_control.max_age = Config.PUBLIC_CACHE_MAX_AGE if max_age is None else max_age
+    return response
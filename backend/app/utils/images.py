@@ -0,0 +1,189 @@
+import hashlib
+import io
+import os
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from PIL import Image
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import ImageBlob
+from app.utils.metrics import timed
+from app.utils.uploads import store_images, upload_folder
+from config import Config
+
+
+# Longest edge limits for the derivatives served to listings
+DERIVATIVE_SIZES = {'thumb': (200, 200), 'card': (480, 600)}
+
+_cache_lock = threading.Lock()
+_cache_state = {'bytes': None}
+
+_executor_lock = threading.Lock()
+_executor = {'pool': None}
+
+
+def get_derivative_executor():
+    """Thread pool for rendering derivatives, apart from the upload pool"""
+    if _executor['pool'] is None:
+        with _executor_lock:
+            if _executor['pool'] is None:
+                _executor['pool'] = ThreadPoolExecutor(
+                    max_workers=Config.DERIVATIVE_WORKERS,
+                    thread_name_prefix='image-derivative'
+                )
+    return _executor['pool']
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def store_deduplicated(images, timeout=None):
+    """Store ``(data, filename)`` pairs, reusing images we already have.
+
+    Identical bytes are only uploaded once: known hashes are answered
+    from the image_blobs index, and duplicates inside the same request
+    share one upload. Returns ``(url, content_hash, error)`` per image,
+    in the given order.
+    """
+    hashes = [content_hash(data) for data, filename in images]
+    known = dict(db.session.query(ImageBlob.content_hash, ImageBlob.image_url).filter(
+        ImageBlob.content_hash.in_(set(hashes))
+    ).all())
+
+    pending = {}
+    for (data, filename), digest in zip(images, hashes):
+        if digest not in known and digest not in pending:
+            pending[digest] = (data, filename)
+
+    uploaded, errors = {}, {}
+    if pending:
+        results = store_images(list(pending.values()), timeout)
+        for (digest, (data, filename)), (image_url, error) in zip(pending.items(), results):
+            if error:
+                errors[digest] = error
+                continue
+            uploaded[digest] = image_url
+            record_blob(digest, image_url)
+            warm_derivatives(digest, data)
+
+    known.update(uploaded)
+    return [(known.get(digest), digest, errors.get(digest)) for digest in hashes]
+
+
+def record_blob(digest, image_url):
+    """Add a hash -> URL entry, tolerating a concurrent insert of the same hash"""
+    try:
+        with db.session.begin_nested():
+            db.session.add(ImageBlob(content_hash=digest, image_url=image_url))
+    except IntegrityError:
+        pass
+
+
+def derivative_folder(app):
+    return os.path.join(upload_folder(app), 'derivatives')
+
+
+def derivative_path(app, digest, size):
+    return os.path.join(derivative_folder(app), f"{digest}_{size}.jpg")
+
+
+def render_derivative(data, size):
+    """Downscale image bytes to a JPEG that fits the named size"""
+    image = Image.open(io.BytesIO(data))
+    image.thumbnail(DERIVATIVE_SIZES[size])
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=85, optimize=True)
+    return output.getvalue()
+
+
+def fetch_original(app, digest):
+    """Read the original bytes back from storage, or None if unknown"""
+    blob = ImageBlob.query.filter_by(content_hash=digest).first()
+    if not blob:
+        return None
+    local_prefix = app.config['LOCAL_STORAGE_URL'].rstrip('/') + '/'
+    if blob.image_url.startswith(local_prefix):
+        path = os.path.join(upload_folder(app), blob.image_url[len(local_prefix):])
+        with open(path, 'rb') as image_file:
+            return image_file.read()
+    return timed(Config.IMAGE_STORAGE, _download)(blob.image_url)
+
+
+def _download(url):
+    with urllib.request.urlopen(url, timeout=Config.UPLOAD_TIMEOUT) as response:
+        return response.read()
+
+
+def ensure_derivative(app, digest, size, data=None):
+    """Path of a cached derivative, rendering it on a miss.
+
+    Hits refresh the file's mtime, which the LRU eviction uses as the
+    last-access time. Returns None when the original is unknown.
+    """
+    path = derivative_path(app, digest, size)
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+
+    if data is None:
+        data = fetch_original(app, digest)
+        if data is None:
+            return None
+
+    rendered = render_derivative(data, size)
+    os.makedirs(derivative_folder(app), exist_ok=True)
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as derivative_file:
+        derivative_file.write(rendered)
+    os.replace(temp_path, path)
+
+    track_cache_growth(app, len(rendered))
+    return path
+
+
+def warm_derivatives(digest, data):
+    """Render all derivatives in the background while the bytes are at hand"""
+    app = current_app._get_current_object()
+
+    def render_all():
+        for size in DERIVATIVE_SIZES:
+            try:
+                ensure_derivative(app, digest, size, data)
+            except Exception as e:
+                app.logger.warning("Derivative %s for %s failed: %s", size, digest, e)
+
+    get_derivative_executor().submit(render_all)
+
+
+def track_cache_growth(app, added):
+    """Account for a new derivative and evict least recently used files"""
+    folder = derivative_folder(app)
+    with _cache_lock:
+        if _cache_state['bytes'] is None:
+            _cache_state['bytes'] = sum(entry.stat().st_size for entry in os.scandir(folder))
+        else:
+            _cache_state['bytes'] += added
+
+        if _cache_state['bytes'] <= Config.DERIVATIVE_CACHE_BYTES:
+            return
+
+        entries = sorted(
+            (entry for entry in os.scandir(folder) if entry.name.endswith('.jpg')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        # Evict down to 90% so we do not rescan on every write
+        target = Config.DERIVATIVE_CACHE_BYTES * 0.9
+        for entry in entries:
+            if _cache_state['bytes'] <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                _cache_state['bytes'] -= size
+            except FileNotFoundError:
+                continue
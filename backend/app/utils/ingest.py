@@ -0,0 +1,128 @@
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import click
+from flask import current_app
+from werkzeug.utils import secure_filename
+from app import db
+from app.models import Item, ItemImage
+from app.utils.facets import invalidate_facets
+from app.utils.http_cache import bump_catalog_version
+from app.utils.tags import refresh_tag_counts
+from app.utils.images import store_deduplicated
+from app.utils.uploads import upload_folder
+from config import Config
+
+
+_executor_lock = threading.Lock()
+_executor = {'pool': None}
+
+
+def get_ingest_executor():
+    """Background pool that moves spooled images to storage"""
+    if _executor['pool'] is None:
+        with _executor_lock:
+            if _executor['pool'] is None:
+                _executor['pool'] = ThreadPoolExecutor(
+                    max_workers=Config.INGEST_WORKERS,
+                    thread_name_prefix='image-ingest'
+                )
+    return _executor['pool']
+
+
+def spool_folder(app, item_id):
+    return os.path.join(upload_folder(app), 'spool', str(item_id))
+
+
+def spool_files(item_id, files):
+    """Save request files under UPLOAD_FOLDER/spool/<item_id>, keeping their order"""
+    folder = spool_folder(current_app, item_id)
+    os.makedirs(folder, exist_ok=True)
+    for position, file in enumerate(files):
+        file.save(os.path.join(folder, f"{position:03d}_{secure_filename(file.filename) or 'image'}"))
+
+
+def enqueue_ingest(item_id):
+    """Hand a spooled item to the background workers"""
+    app = current_app._get_current_object()
+    get_ingest_executor().submit(ingest_item, app, item_id)
+
+
+def ingest_item(app, item_id):
+    """Push an item's spooled images to storage, then list the item.
+
+    The item stays in 'processing' until every image is stored. If the
+    main image cannot be stored, or anything else goes wrong, the item
+    is marked 'failed'; failed additional images are skipped, as in the
+    synchronous upload.
+    """
+    with app.app_context():
+        folder = spool_folder(app, item_id)
+        try:
+            names = sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+            images = []
+            for name in names:
+                with open(os.path.join(folder, name), 'rb') as image_file:
+                    images.append((image_file.read(), name.split('_', 1)[1]))
+
+            results = store_deduplicated(images) if images else []
+            item = db.session.get(Item, item_id)
+            if not item or item.status != 'processing':
+                shutil.rmtree(folder, ignore_errors=True)
+                return
+
+            if not results or results[0][2]:
+                app.logger.error("Ingest failed for item %s: %s", item_id, results[0][2] if results else 'no images')
+                item.status = 'failed'
+                db.session.commit()
+                shutil.rmtree(folder, ignore_errors=True)
+                return
+
+            for image_url, image_hash, error in results:
+                if error:
+                    app.logger.warning("Additional image upload failed for item %s: %s", item_id, error)
+                    continue
+                db.session.add(ItemImage(item_id=item.id, image_url=image_url, content_hash=image_hash))
+
+            item.status = 'available'
+            refresh_tag_counts([tag.id for tag in item.tag_list])
+            bump_catalog_version()
+            db.session.commit()
+            invalidate_facets()
+            shutil.rmtree(folder, ignore_errors=True)
+        except Exception:
+            app.logger.exception("Ingest failed for item %s", item_id)
+            db.session.rollback()
+            db.session.query(Item).filter_by(id=item_id, status='processing').update(
+                {"status": 'failed', "version": Item.version + 1}, synchronize_session=False)
+            db.session.commit()
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+@click.command('resume-ingest')
+@click.option('--stale-minutes', default=None, type=int,
+              help='Only items untouched for this long (default INGEST_STALE_MINUTES).')
+def resume_ingest_command(stale_minutes):
+    """Re-run ingestion for items left in 'processing' by a restart.
+
+    Only items that have sat in 'processing' for longer than the stale
+    window are taken, so uploads a running server is still ingesting are
+    left alone. Each item is claimed with a conditional update first, so
+    two runs of the command never ingest the same item.
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=Config.INGEST_STALE_MINUTES if stale_minutes is None else stale_minutes)
+    item_ids = [item_id for item_id, in db.session.query(Item.id).filter(
+        Item.status == 'processing', Item.updated_at < cutoff)]
+
+    resumed = 0
+    for item_id in item_ids:
+        claimed = db.session.query(Item).filter(
+            Item.id == item_id, Item.status == 'processing', Item.updated_at < cutoff
+        ).update({"updated_at": datetime.utcnow(), "version": Item.version + 1}, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            ingest_item(current_app._get_current_object(), item_id)
+            resumed += 1
+    click.echo(f"Resumed ingestion for {resumed} item(s)")
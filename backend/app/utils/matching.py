@@ -0,0 +1,189 @@
+import threading
+from datetime import timedelta
+from app import db
+from app.models import Swap, Item
+from config import Config
+
+
+# Directed "wants" graph between users, built from pending swap requests.
+# wants[u][v] and wanted_by[v][u] share one {swap_id: item_id} dict: the
+# items u asked v for. swaps maps swap_id -> (u, v) so an edge can be
+# dropped by swap id alone.
+_lock = threading.Lock()
+_graph = {'loaded': False, 'synced_to': None, 'swaps': {}, 'wants': {}, 'wanted_by': {}}
+
+
+def _add(swap_id, requester_id, owner_id, item_id):
+    if swap_id in _graph['swaps'] or requester_id == owner_id:
+        return
+    edge = _graph['wants'].setdefault(requester_id, {}).get(owner_id)
+    if edge is None:
+        edge = _graph['wants'][requester_id][owner_id] = {}
+        _graph['wanted_by'].setdefault(owner_id, {})[requester_id] = edge
+    edge[swap_id] = item_id
+    _graph['swaps'][swap_id] = (requester_id, owner_id)
+
+
+def _remove(swap_id):
+    ends = _graph['swaps'].pop(swap_id, None)
+    if ends is None:
+        return
+    requester_id, owner_id = ends
+    edge = _graph['wants'][requester_id][owner_id]
+    del edge[swap_id]
+    if not edge:
+        del _graph['wants'][requester_id][owner_id]
+        del _graph['wanted_by'][owner_id][requester_id]
+        if not _graph['wants'][requester_id]:
+            del _graph['wants'][requester_id]
+        if not _graph['wanted_by'][owner_id]:
+            del _graph['wanted_by'][owner_id]
+
+
+def add_wants(rows):
+    """Add ``(swap_id, requester_id, owner_id, item_id)`` edges to the graph"""
+    with _lock:
+        for row in rows:
+            _add(*row)
+
+
+def swaps_opened(rows):
+    """Record new pending swaps; call after committing them"""
+    if _graph['loaded']:
+        add_wants(rows)
+
+
+def swaps_closed(swap_ids):
+    """Drop swaps that stopped being pending; call after committing the change"""
+    with _lock:
+        for swap_id in swap_ids:
+            _remove(swap_id)
+
+
+def _replaced(swap_id, requester_id, owner_id, item_id):
+    """True when the graph holds a different swap under this id (ids can be reused)"""
+    ends = _graph['swaps'].get(swap_id)
+    if ends is None:
+        return False
+    return ends != (requester_id, owner_id) or _graph['wants'][ends[0]][ends[1]][swap_id] != item_id
+
+
+def catch_up():
+    """Pull pending swaps created since the last sync (all of them on first use).
+
+    Neither ids nor commit order can be trusted to only grow: SQLite hands
+    out a deleted swap's id again, and a transaction can commit after a
+    later one was read. So each sync re-reads pending swaps created within
+    MATCHING_SYNC_OVERLAP seconds of the newest one seen, one indexed
+    range query on (status, created_at). Rows already in the graph are
+    skipped unless their id now names a different swap. Swaps opened by
+    other worker processes show up here; swaps they closed are pruned when
+    suggestions are verified.
+    """
+    query = db.session.query(
+        Swap.id, Swap.requester_id, Item.uploader_id, Swap.requested_item_id, Swap.created_at
+    ).join(Item, Swap.requested_item_id == Item.id).filter(Swap.status == 'pending')
+    synced_to = _graph['synced_to']
+    if synced_to is not None:
+        query = query.filter(Swap.created_at >= synced_to - timedelta(seconds=Config.MATCHING_SYNC_OVERLAP))
+    rows = query.all()
+
+    with _lock:
+        for *row, created_at in rows:
+            if _replaced(*row):
+                _remove(row[0])
+            _add(*row)
+            if created_at and (_graph['synced_to'] is None or created_at > _graph['synced_to']):
+                _graph['synced_to'] = created_at
+        _graph['loaded'] = True
+
+
+def reset_graph():
+    with _lock:
+        _graph.update(loaded=False, synced_to=None, swaps={}, wants={}, wanted_by={})
+
+
+def find_cycles(user_id, limit=10):
+    """Cycles of 2 to 4 users through ``user_id``, each wanting the next one's item.
+
+    Shortest cycles first. Work is bounded by the user's neighbourhood:
+    rings of four meet in the middle, joining two-step paths out of the
+    user with two-step paths back into it.
+    """
+    cycles = []
+    with _lock:
+        wants, wanted_by = _graph['wants'], _graph['wanted_by']
+        out = wants.get(user_id, {})
+        into = wanted_by.get(user_id, {})
+
+        for a in out:
+            if a in into:
+                cycles.append([user_id, a])
+                if len(cycles) >= limit:
+                    return cycles
+
+        for a in out:
+            for b in wants.get(a, ()):
+                if b != user_id and b in into:
+                    cycles.append([user_id, a, b])
+                    if len(cycles) >= limit:
+                        return cycles
+
+        back = {}
+        for c in into:
+            for b in wanted_by.get(c, ()):
+                if b != user_id:
+                    back.setdefault(b, []).append(c)
+
+        for a in out:
+            for b in wants.get(a, ()):
+                for c in back.get(b, ()):
+                    if b != user_id and c != a:
+                        cycles.append([user_id, a, b, c])
+                        if len(cycles) >= limit:
+                            return cycles
+    return cycles
+
+
+def cycle_steps(cycle):
+    """Concrete swaps for a user cycle: each user takes the oldest item they asked the next for"""
+    steps = []
+    with _lock:
+        for user_id, from_user_id in zip(cycle, cycle[1:] + cycle[:1]):
+            edge = _graph['wants'].get(user_id, {}).get(from_user_id)
+            if not edge:
+                return None
+            swap_id = min(edge)
+            steps.append({
+                "swap_id": swap_id,
+                "user_id": user_id,
+                "from_user_id": from_user_id,
+                "item_id": edge[swap_id]
+            })
+    return steps
+
+
+def suggest_cycles(user_id, limit=10):
+    """Trade cycles for a user, checked against the database.
+
+    Steps whose swap is no longer pending, or whose item is no longer
+    available, are dropped from the graph and the search is run again.
+    """
+    catch_up()
+    for _ in range(3):
+        suggestions = [steps for steps in map(cycle_steps, find_cycles(user_id, limit)) if steps]
+        swap_ids = {step['swap_id'] for steps in suggestions for step in steps}
+        if not swap_ids:
+            return []
+
+        live = {swap_id for (swap_id,) in db.session.query(Swap.id).join(
+            Item, Swap.requested_item_id == Item.id
+        ).filter(
+            Swap.id.in_(swap_ids),
+            Swap.status == 'pending',
+            Item.status == 'available'
+        )}
+        if live == swap_ids:
+            return suggestions
+        swaps_closed(swap_ids - live)
+    return [steps for steps in suggestions if all(step['swap_id'] in live for step in steps)]
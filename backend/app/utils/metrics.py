@@ -0,0 +1,239 @@
+import hmac
+import json
+import logging
+import random
+import threading
+import time
+from flask import Response, current_app, g, jsonify, request, has_request_context
+from sqlalchemy import event
+from app import db
+from config import Config
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_sinks = []
+
+
+class Histogram:
+    """Prometheus histogram with a fixed label set, safe to share between threads"""
+
+    def __init__(self, name, help, labels, buckets):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self.lock = threading.Lock()
+        self.series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, values, amount):
+        with self.lock:
+            series = self.series.get(values)
+            if series is None:
+                series = self.series[values] = [0] * (len(self.buckets) + 2)
+            for position, bound in enumerate(self.buckets):
+                if amount <= bound:
+                    series[position] += 1
+            series[-2] += amount
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = sorted((values, list(counts)) for values, counts in self.series.items())
+        for values, counts in series:
+            labels = ','.join(f'{label}="{_escape(value)}"' for label, value in zip(self.labels, values))
+            prefix = labels + ',' if labels else ''
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {counts[-1]}')
+            lines.append(f'{self.name}_sum{{{labels}}} {counts[-2]}')
+            lines.append(f'{self.name}_count{{{labels}}} {counts[-1]}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class PrometheusSink:
+    """Aggregates request and call records into histograms served at /metrics.
+
+    Counts are per process; with several workers, scrape each one or add a
+    sink that ships records to a shared collector.
+    """
+
+    def __init__(self):
+        endpoint = ('blueprint', 'endpoint')
+        self.request_seconds = Histogram(
+            'http_request_duration_seconds', 'Wall time per request.',
+            endpoint + ('method', 'status'), DURATION_BUCKETS)
+        self.response_bytes = Histogram(
+            'http_response_size_bytes', 'Response body size, for responses that are not streamed.',
+            endpoint, SIZE_BUCKETS)
+        self.sql_statements = Histogram(
+            'db_statements_per_request', 'SQL statements executed per request.',
+            endpoint, COUNT_BUCKETS)
+        self.sql_seconds = Histogram(
+            'db_seconds_per_request', 'Time spent in SQL statements per request.',
+            endpoint, DURATION_BUCKETS)
+        self.call_seconds = Histogram(
+            'external_call_duration_seconds', 'Wall time per call to an external service.',
+            ('service',) + endpoint, DURATION_BUCKETS)
+
+    def record_request(self, record):
+        tags = (record['blueprint'], record['endpoint'])
+        self.request_seconds.observe(tags + (record['method'], str(record['status'])), record['duration_ms'] / 1000)
+        if record['response_bytes'] is not None:
+            self.response_bytes.observe(tags, record['response_bytes'])
+        self.sql_statements.observe(tags, record['sql_statements'])
+        self.sql_seconds.observe(tags, record['sql_ms'] / 1000)
+
+    def record_call(self, record):
+        self.call_seconds.observe((record['service'], record['blueprint'], record['endpoint']), record['duration_ms'] / 1000)
+
+    def render(self):
+        lines = []
+        for histogram in (self.request_seconds, self.response_bytes, self.sql_statements,
+                          self.sql_seconds, self.call_seconds):
+            lines += histogram.render()
+        return '\n'.join(lines) + '\n'
+
+
+class SampledLogSink:
+    """Logs a sample of requests as one JSON object per line; slow requests always"""
+
+    def __init__(self, logger, sample_rate=None, slow_ms=None):
+        self.logger = logger
+        self.sample_rate = Config.METRICS_LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.slow_ms = Config.METRICS_SLOW_REQUEST_MS if slow_ms is None else slow_ms
+
+    def record_request(self, record):
+        if record['duration_ms'] >= self.slow_ms or random.random() < self.sample_rate:
+            self.logger.info(json.dumps(record))
+
+    def record_call(self, record):
+        pass
+
+
+def add_sink(sink):
+    """Send every request and call record to ``sink``.
+
+    A sink has ``record_request(record)`` and ``record_call(record)``;
+    records are plain dicts, see finish_request() and timed().
+    """
+    _sinks.append(sink)
+
+
+def _emit(kind, record):
+    for sink in _sinks:
+        getattr(sink, kind)(record)
+
+
+def request_tags():
+    """(blueprint, endpoint) of the current request, for labelling work done for it"""
+    if not has_request_context():
+        return 'none', 'background'
+    return request.blueprint or 'none', request.endpoint or 'unmatched'
+
+
+def timed(service, function):
+    """Wrap ``function`` so each call is recorded as a call to ``service``.
+
+    Wrap in the request thread; the wrapper may then run on a worker
+    thread and still be tagged with, and counted toward, that request.
+    """
+    blueprint, endpoint = request_tags()
+    calls = g.metrics['calls'] if has_request_context() and 'metrics' in g else None
+
+    def call(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            if calls is not None:
+                calls.append(elapsed)
+            _emit('record_call', {"service": service, "blueprint": blueprint, "endpoint": endpoint,
+                                  "duration_ms": round(elapsed, 3)})
+
+    return call
+
+
+def start_request():
+    g.metrics = {'start': time.perf_counter(), 'sql_statements': 0, 'sql_seconds': 0.0, 'calls': []}
+
+
+def finish_request(response):
+    metrics = g.pop('metrics', None)
+    if metrics is None:
+        return response
+
+    blueprint, endpoint = request_tags()
+    streamed = response.is_streamed or response.direct_passthrough
+    _emit('record_request', {
+        "blueprint": blueprint,
+        "endpoint": endpoint,
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "duration_ms": round((time.perf_counter() - metrics['start']) * 1000, 3),
+        "sql_statements": metrics['sql_statements'],
+        "sql_ms": round(metrics['sql_seconds'] * 1000, 3),
+        "external_calls": len(metrics['calls']),
+        "external_ms": round(sum(metrics['calls']), 3),
+        "response_bytes": None if streamed else response.calculate_content_length()
+    })
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'metrics' in g and hasattr(context, 'metrics_start'):
+        g.metrics['sql_statements'] += 1
+        g.metrics['sql_seconds'] += time.perf_counter() - context.metrics_start
+
+
+def metrics_view():
+    """Prometheus text format from every sink that can render it.
+
+    Needs ``Authorization: Bearer <METRICS_TOKEN>``, the scraper's
+    bearer token.
+    """
+    supplied = request.headers.get('Authorization', '').encode()
+    token = current_app.config['METRICS_TOKEN']
+    if not token or not hmac.compare_digest(supplied, f"Bearer {token}".encode()):
+        return jsonify({"success": False, "message": "Invalid metrics token"}), 401
+    body = ''.join(sink.render() for sink in _sinks if hasattr(sink, 'render'))
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+
+def configure_metrics(app):
+    """Time every request and its SQL, and serve the histograms at /metrics.
+
+    /metrics is only served when METRICS_TOKEN is set.
+    """
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    if not _sinks:
+        logger = logging.getLogger('re-wear.requests')
+        if not logger.handlers:
+            logger.addHandler(logging.StreamHandler())
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+        add_sink(PrometheusSink())
+        add_sink(SampledLogSink(logger))
+
+    with app.app_context():
+        engine = db.engine
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    if app.config['METRICS_TOKEN']:
+        app.add_url_rule('/metrics', 'metrics', metrics_view)
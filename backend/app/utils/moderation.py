@@ -0,0 +1,73 @@
+from datetime import datetime
+from sqlalchemy import update, insert, tuple_
+from app import db
+from app.models import Item, AdminAction
+
+
+# Column values each moderation action sets on an item
+MODERATION_ACTIONS = {
+    'approve': {'approved': True, 'status': 'available'},
+    'reject': {'approved': False, 'status': 'rejected'},
+    'remove': {'status': 'removed'},
+}
+
+
+class ModerationConflict(Exception):
+    """Raised when an item changed between reading and updating it"""
+
+
+def moderate_in_bulk(admin_id, entries):
+    """Apply ``(item_id, action, reason)`` entries with one UPDATE per action.
+
+    Items are loaded in one query and updated with compare-and-set on the
+    loaded version; if any changed underneath, ModerationConflict is
+    raised and the caller should roll back and retry. All AdminAction rows
+    go in with one INSERT.
+
+    Returns ``(results, moderated_item_ids, pending_delta)``; results are
+    dicts in request order and pending_delta is the change in the number
+    of unapproved items. Nothing is committed.
+    """
+    items = {item.id: item for item in Item.query.filter(
+        Item.id.in_({item_id for item_id, action, reason in entries})
+    ).all()}
+
+    results, seen = [], set()
+    by_action = {action: [] for action in MODERATION_ACTIONS}
+    actions = []
+    for item_id, action, reason in entries:
+        result = {"item_id": item_id, "action": action, "success": False}
+        results.append(result)
+
+        if item_id in seen:
+            result.update(code=400, message="Duplicate item in batch")
+        elif item_id not in items:
+            result.update(code=404, message="Item not found")
+        else:
+            by_action[action].append(items[item_id])
+            actions.append({"admin_id": admin_id, "item_id": item_id, "action": action, "reason": reason})
+            result.update(success=True, code=200, **MODERATION_ACTIONS[action])
+        seen.add(item_id)
+
+    now = datetime.utcnow()
+    pending_delta = 0
+    for action, targets in by_action.items():
+        if not targets:
+            continue
+        updated = db.session.execute(
+            update(Item).where(
+                tuple_(Item.id, Item.version).in_([(item.id, item.version) for item in targets])
+            ).values(version=Item.version + 1, updated_at=now, **MODERATION_ACTIONS[action]),
+            execution_options={"synchronize_session": False}
+        ).rowcount
+        if updated != len(targets):
+            raise ModerationConflict()
+
+        approved = MODERATION_ACTIONS[action].get('approved')
+        if approved is not None:
+            pending_delta += sum((not approved) - (not item.approved) for item in targets)
+
+    if actions:
+        db.session.execute(insert(AdminAction), actions)
+
+    return results, [action['item_id'] for action in actions], pending_delta
@@ -0,0 +1,94 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from flask import request, jsonify
+from sqlalchemy import tuple_
+from config import Config
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue"""
+
+
+def handle_invalid_cursor(error):
+    return jsonify({"success": False, "message": "Invalid cursor"}), 400
+
+
+def get_per_page(default):
+    """Read per_page from the query string, clamped to MAX_PER_PAGE"""
+    per_page = request.args.get('per_page', default, type=int)
+    return max(1, min(per_page, Config.MAX_PER_PAGE))
+
+
+def encode_cursor(sort_value, row_id):
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, row_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Cursor back to ``(sort_value, id)``; strings are timestamps, numbers stay numbers"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(payload)
+        if isinstance(sort_value, str):
+            sort_value = datetime.fromisoformat(sort_value)
+        elif not isinstance(sort_value, (int, float)) or isinstance(sort_value, bool):
+            raise TypeError(sort_value)
+        return sort_value, int(row_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+
+def paginate_query(query, model, default_per_page, sort_column=None, descending=True):
+    """Paginate a query newest first, by page number or by cursor.
+
+    Without a ``cursor`` argument this is the classic page/pages/total
+    pagination. Passing ``cursor`` (empty for the first page) switches to
+    keyset pagination on ``(created_at, id)``: no OFFSET, and the total is
+    only counted when ``include_total=true`` is also passed.
+
+    ``sort_column`` orders by another non-null expression instead of
+    ``created_at`` (ties broken by id), ``descending=False`` flips the order.
+
+    Returns the rows for the page and the ``pagination`` dict.
+    """
+    per_page = get_per_page(default_per_page)
+    sort_column = model.created_at if sort_column is None else sort_column
+    row_id = model.id
+    order = (sort_column.desc(), row_id.desc()) if descending else (sort_column.asc(), row_id.asc())
+
+    if 'cursor' not in request.args:
+        page = request.args.get('page', 1, type=int)
+        result = query.order_by(*order).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+        return result.items, {
+            "page": page,
+            "per_page": per_page,
+            "total": result.total,
+            "pages": result.pages
+        }
+
+    # Keyset order must be exactly (sort_column, id), so drop any ranking
+    query = query.order_by(None)
+    pagination = {"per_page": per_page}
+
+    if request.args.get('include_total', 'false').lower() == 'true':
+        pagination["total"] = query.count()
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        key, after = tuple_(sort_column, row_id), tuple_(*decode_cursor(cursor))
+        query = query.filter(key < after if descending else key > after)
+
+    # Select the sort value alongside each row so the next cursor can carry it
+    rows = query.add_columns(sort_column).order_by(*order).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    pagination["has_more"] = has_more
+    pagination["next_cursor"] = encode_cursor(rows[-1][-1], rows[-1][0].id) if has_more else None
+    return [row[0] for row in rows], pagination
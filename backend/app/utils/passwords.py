@@ -0,0 +1,91 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from flask import jsonify
+from werkzeug.security import generate_password_hash, check_password_hash
+from config import Config
+
+
+_executor_lock = threading.Lock()
+_executor = {'pool': None}
+# Hashes running or waiting in the pool, including abandoned ones; past this, callers are turned away
+_slots = threading.BoundedSemaphore(max(1, Config.HASH_QUEUE_LIMIT))
+
+
+class HashingBusy(Exception):
+    """Raised when too many password hashes are already queued"""
+
+
+def handle_hashing_busy(error):
+    response = jsonify({"success": False, "message": "Server busy, please try again"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+def get_hash_executor():
+    """Worker processes for PBKDF2, so hashing never ties up request threads.
+
+    Started on the first hash, so CLI commands and the reloader's parent
+    process never fork them. The workers only run hashlib, so forking
+    from a process that already has threads is safe for them.
+    """
+    if _executor['pool'] is None:
+        with _executor_lock:
+            if _executor['pool'] is None:
+                # Forked rather than spawned, which would re-run the server's main module in each worker
+                method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+                _executor['pool'] = ProcessPoolExecutor(
+                    max_workers=Config.HASH_WORKERS,
+                    mp_context=multiprocessing.get_context(method)
+                )
+    return _executor['pool']
+
+
+def _run(function, *args):
+    if not Config.HASH_WORKERS:
+        return function(*args)
+
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        future = get_hash_executor().submit(function, *args)
+    except Exception:
+        _slots.release()
+        raise
+    # Hold the slot until the pool is done with the job, even if we stop waiting for it
+    future.add_done_callback(lambda future: _slots.release())
+    try:
+        return future.result(timeout=Config.HASH_TIMEOUT)
+    except TimeoutError:
+        future.cancel()
+        raise HashingBusy()
+
+
+def needs_rehash(password_hash, method=None):
+    """True when a hash was made with other parameters than PASSWORD_HASH_METHOD"""
+    return password_hash.split('$', 1)[0] != (method or Config.PASSWORD_HASH_METHOD)
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(password_hash, password, method):
+    if not check_password_hash(password_hash, password):
+        return False, None
+    return True, _hash(password, method) if needs_rehash(password_hash, method) else None
+
+
+def hash_password(password):
+    """Hash a new password in the worker pool; raises HashingBusy when it is full"""
+    return _run(_hash, password, Config.PASSWORD_HASH_METHOD)
+
+
+def verify_password(password_hash, password):
+    """Check a password in the worker pool.
+
+    Returns ``(matches, new_hash)``; new_hash is set when the password
+    matched but was stored with outdated parameters, and should replace
+    the stored hash. Raises HashingBusy when the pool is full.
+    """
+    return _run(_verify, password_hash, password, Config.PASSWORD_HASH_METHOD)
@@ -0,0 +1,133 @@
+from collections import defaultdict
+import click
+from sqlalchemy import update, insert, case, func
+from app import db
+from app.models import User, Redemption, PointsLedger
+from app.utils.auth_util import invalidate_users
+
+
+class InsufficientPoints(Exception):
+    """Raised when a debit would take a balance below zero"""
+
+
+def _apply(user_id, delta, reason, swap_id=None, condition=None):
+    """Change a balance with one conditional UPDATE and log it in the ledger.
+
+    Returns the new balance, or None when no row matched (unknown user or
+    the condition failed). The ledger row is written in the same
+    transaction, so balance and ledger commit or roll back together.
+    """
+    statement = update(User).where(User.id == user_id)
+    if condition is not None:
+        statement = statement.where(condition)
+    balance = db.session.execute(
+        statement.values(points_balance=User.points_balance + delta).returning(User.points_balance)
+    ).scalar()
+    if balance is None:
+        return None
+
+    invalidate_users([user_id])
+    db.session.add(PointsLedger(
+        user_id=user_id,
+        delta=delta,
+        balance_after=balance,
+        reason=reason,
+        swap_id=swap_id
+    ))
+    return balance
+
+
+def debit_points(user_id, amount, reason, swap_id=None):
+    """Take points from a user, failing instead of going negative"""
+    balance = _apply(user_id, -amount, reason, swap_id, condition=User.points_balance >= amount)
+    if balance is None:
+        raise InsufficientPoints(user_id)
+    return balance
+
+
+def credit_points(user_id, amount, reason, swap_id=None):
+    """Give points to a user; returns the new balance or None if no such user"""
+    return _apply(user_id, amount, reason, swap_id)
+
+
+def refund_swaps(swap_ids, reason='swap_refund'):
+    """Cancel the pending redemptions of the given swaps and refund them.
+
+    Set-based: one UPDATE cancels the redemptions, one UPDATE credits every
+    affected user and one INSERT writes the ledger. Only redemptions that
+    were still pending are refunded, so a swap is never refunded twice.
+    Returns the number of redemptions cancelled.
+    """
+    if not swap_ids:
+        return 0
+
+    cancelled = db.session.execute(
+        update(Redemption).where(
+            Redemption.swap_id.in_(swap_ids),
+            Redemption.status == 'pending'
+        ).values(status='cancelled').returning(
+            Redemption.user_id, Redemption.points_used, Redemption.swap_id
+        ),
+        execution_options={"synchronize_session": False}
+    ).all()
+
+    refunds = [row for row in cancelled if row.points_used]
+    totals = defaultdict(int)
+    for row in refunds:
+        totals[row.user_id] += row.points_used
+    if not totals:
+        return len(cancelled)
+
+    balances = dict(db.session.execute(
+        update(User).where(User.id.in_(totals)).values(
+            points_balance=User.points_balance + case(totals, value=User.id)
+        ).returning(User.id, User.points_balance),
+        execution_options={"synchronize_session": False}
+    ).all())
+    invalidate_users(balances)
+
+    # Walk each user's refunds back from the final balance for balance_after
+    ledger = []
+    for row in reversed(refunds):
+        ledger.append({
+            "user_id": row.user_id,
+            "delta": row.points_used,
+            "balance_after": balances[row.user_id],
+            "reason": reason,
+            "swap_id": row.swap_id
+        })
+        balances[row.user_id] -= row.points_used
+    ledger.reverse()
+    db.session.execute(insert(PointsLedger), ledger)
+    return len(cancelled)
+
+
+def find_drift():
+    """Users whose stored balance differs from the sum of their ledger"""
+    ledger = db.session.query(
+        PointsLedger.user_id,
+        func.sum(PointsLedger.delta).label('total')
+    ).group_by(PointsLedger.user_id).subquery()
+
+    rows = db.session.query(
+        User.id,
+        func.coalesce(User.points_balance, 0),
+        func.coalesce(ledger.c.total, 0)
+    ).outerjoin(ledger, ledger.c.user_id == User.id).filter(
+        func.coalesce(User.points_balance, 0) != func.coalesce(ledger.c.total, 0)
+    ).all()
+    return [(user_id, balance, expected) for user_id, balance, expected in rows]
+
+
+@click.command('reconcile-points')
+@click.option('--fix', is_flag=True, help='Reset drifted balances to their ledger totals.')
+def reconcile_points_command(fix):
+    """Compare every points balance with its ledger."""
+    drift = find_drift()
+    for user_id, balance, expected in drift:
+        click.echo(f"user {user_id}: balance {balance}, ledger {expected}")
+        if fix:
+            db.session.execute(update(User).where(User.id == user_id).values(points_balance=expected))
+    if fix:
+        db.session.commit()
+    click.echo(f"{len(drift)} drifted balance(s){' fixed' if fix and drift else ''}")
@@ -0,0 +1,131 @@
+from collections import Counter
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import update, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import ActivityRollup, Item, Swap, AdminAction
+from config import Config
+
+
+PERIODS = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+
+METRICS = ('items_listed', 'swaps_requested', 'swaps_accepted', 'items_approved', 'items_rejected', 'items_removed')
+
+# Rollup metric for each moderation action
+MODERATION_METRICS = {'approve': 'items_approved', 'reject': 'items_rejected', 'remove': 'items_removed'}
+
+UPSERT_ROWS = 1000
+
+
+def bucket_start(when, period):
+    """Start of the hour or day ``when`` falls in"""
+    when = when.replace(minute=0, second=0, microsecond=0)
+    return when.replace(hour=0) if period == 'day' else when
+
+
+def record_activity(events):
+    """Count ``(metric, category, when)`` events into the hourly and daily rollups.
+
+    ``when`` may be None for "now". Runs in the current transaction, so
+    call it before committing the write it describes.
+    """
+    counts = bucket_counts(events, now=datetime.utcnow())
+    if counts:
+        _upsert(counts)
+
+
+def bucket_counts(events, now=None):
+    """Count ``(metric, category, when)`` events per hour and per day bucket"""
+    return Counter(
+        (period, bucket_start(when or now, period), metric, category)
+        for metric, category, when in events
+        for period in PERIODS
+    )
+
+
+def _upsert(counts):
+    """Add ``{(period, bucket_start, metric, category): count}`` to the stored rows"""
+    rows = [{"period": period, "bucket_start": bucket, "metric": metric, "category": category, "count": count}
+            for (period, bucket, metric, category), count in counts.items()]
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        for start in range(0, len(rows), UPSERT_ROWS):
+            statement = insert(ActivityRollup).values(rows[start:start + UPSERT_ROWS])
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=['period', 'bucket_start', 'metric', 'category'],
+                set_={"count": ActivityRollup.count + statement.excluded['count']}
+            ))
+        return
+
+    # No upsert statement; update what exists and insert the rest
+    for row in rows:
+        updated = db.session.execute(
+            update(ActivityRollup).where(
+                ActivityRollup.period == row['period'],
+                ActivityRollup.bucket_start == row['bucket_start'],
+                ActivityRollup.metric == row['metric'],
+                ActivityRollup.category == row['category']
+            ).values(count=ActivityRollup.count + row['count']),
+            execution_options={"synchronize_session": False}
+        ).rowcount
+        if not updated:
+            db.session.add(ActivityRollup(**row))
+
+
+def load_activity(period, start, end, metrics=None, category=None):
+    """Rollup rows with ``start <= bucket_start < end``, oldest first"""
+    query = db.session.query(
+        ActivityRollup.bucket_start, ActivityRollup.metric, ActivityRollup.category, ActivityRollup.count
+    ).filter(
+        ActivityRollup.period == period,
+        ActivityRollup.bucket_start >= bucket_start(start, period),
+        ActivityRollup.bucket_start < end
+    )
+    if metrics:
+        query = query.filter(ActivityRollup.metric.in_(metrics))
+    if category:
+        query = query.filter(ActivityRollup.category == category)
+    return query.order_by(ActivityRollup.bucket_start, ActivityRollup.metric, ActivityRollup.category).all()
+
+
+def recorded_activity(since):
+    """Every countable event still in the tables since ``since``, as record_activity takes them"""
+    sources = [
+        ('items_listed', db.session.query(Item.created_at, Item.category).filter(Item.created_at >= since)),
+        ('swaps_requested', db.session.query(Swap.created_at, Item.category).join(
+            Item, Swap.requested_item_id == Item.id
+        ).filter(Swap.created_at >= since)),
+        ('swaps_accepted', db.session.query(Swap.updated_at, Item.category).join(
+            Item, Swap.requested_item_id == Item.id
+        ).filter(Swap.status == 'accepted', Swap.updated_at >= since)),
+    ]
+    for metric, query in sources:
+        for when, category in query.yield_per(Config.EXPORT_YIELD_PER):
+            yield metric, category, when
+
+    moderation = db.session.query(AdminAction.created_at, AdminAction.action, Item.category).join(
+        Item, AdminAction.item_id == Item.id
+    ).filter(AdminAction.created_at >= since, AdminAction.action.in_(MODERATION_METRICS))
+    for when, action, category in moderation.yield_per(Config.EXPORT_YIELD_PER):
+        yield MODERATION_METRICS[action], category, when
+
+
+@click.command('backfill-rollups')
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Only rebuild days from this date on (default: everything).')
+def backfill_rollups_command(since):
+    """Rebuild the activity rollups from the items, swaps and admin actions tables.
+
+    Rows removed since they were counted (deleted items and their swaps)
+    drop out of the rebuilt rollups.
+    """
+    since = bucket_start(since or datetime(1970, 1, 1), 'day')
+    db.session.execute(delete(ActivityRollup).where(ActivityRollup.bucket_start >= since))
+    counts = bucket_counts(event for event in recorded_activity(since) if event[2] is not None)
+    if counts:
+        _upsert(counts)
+    db.session.commit()
+    click.echo(f"Rebuilt {len(counts)} rollup row(s) since {since.date().isoformat()}")
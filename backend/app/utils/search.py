@@ -0,0 +1,138 @@
+import re
+from sqlalchemy import text, func, literal_column, Integer, Float
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.models import Item
+
+
+# Column weights used when ranking matches: title, description, tags
+SQLITE_WEIGHTS = (10.0, 2.0, 5.0)
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+        title, description, tags,
+        content='items', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts(rowid, title, description, tags)
+        VALUES (new.id, new.title, new.description, new.tags);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, title, description, tags)
+        VALUES ('delete', old.id, old.title, old.description, old.tags);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE OF title, description, tags ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, title, description, tags)
+        VALUES ('delete', old.id, old.title, old.description, old.tags);
+        INSERT INTO items_fts(rowid, title, description, tags)
+        VALUES (new.id, new.title, new.description, new.tags);
+    END
+    """,
+]
+
+POSTGRES_DDL = [
+    """
+    ALTER TABLE items ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(tags, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_items_search_vector ON items USING GIN (search_vector)",
+]
+
+# Backend picked by init_search(): 'fts5', 'tsvector' or 'like'
+_backend = {'name': 'like'}
+
+
+def init_search():
+    """Create the full-text index for the current database.
+
+    The index is kept in sync by the database itself (triggers on SQLite,
+    a generated column on Postgres), so item writes need no extra code.
+    Falls back to ILIKE matching when neither is available.
+    """
+    engine = db.engine
+    dialect = engine.dialect.name
+
+    if dialect == 'sqlite':
+        try:
+            with engine.begin() as conn:
+                exists = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items_fts'"
+                )).first()
+                for statement in SQLITE_DDL:
+                    conn.execute(text(statement))
+                if not exists:
+                    # Index rows that were written before the table existed
+                    conn.execute(text("INSERT INTO items_fts(items_fts) VALUES ('rebuild')"))
+        except OperationalError:
+            # SQLite built without FTS5
+            _backend['name'] = 'like'
+            return
+        _backend['name'] = 'fts5'
+
+    elif dialect == 'postgresql':
+        with engine.begin() as conn:
+            for statement in POSTGRES_DDL:
+                conn.execute(text(statement))
+        _backend['name'] = 'tsvector'
+
+    else:
+        _backend['name'] = 'like'
+
+
+def search_terms(search):
+    """Split a raw search string into lowercase word tokens"""
+    return re.findall(r'\w+', search.lower())
+
+
+def apply_search(query, search):
+    """Filter an Item query by a search string, best matches first.
+
+    Every word must match, and the last word is matched as a prefix so
+    results update while the user is still typing.
+    """
+    terms = search_terms(search)
+    if not terms:
+        return query
+
+    backend = _backend['name']
+
+    if backend == 'fts5':
+        match = ' '.join(f'"{term}"' for term in terms[:-1])
+        match = f'{match} "{terms[-1]}"*'.strip()
+        weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS)
+        matches = text(
+            f"SELECT rowid AS item_id, bm25(items_fts, {weights}) AS rank "
+            "FROM items_fts WHERE items_fts MATCH :match"
+        ).bindparams(match=match).columns(item_id=Integer, rank=Float).subquery()
+        # "+ 0" keeps SQLite from probing the FTS table per item row, which it
+        # otherwise picks for counts when an index on items covers the filters
+        query = query.join(matches, Item.id == matches.c.item_id + 0).order_by(matches.c.rank.asc())
+        return query
+
+    if backend == 'tsvector':
+        tsquery = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+        vector = literal_column('items.search_vector')
+        ts_query = func.to_tsquery('simple', tsquery)
+        query = query.filter(vector.op('@@')(ts_query)).order_by(func.ts_rank(vector, ts_query).desc())
+        return query
+
+    for term in terms:
+        query = query.filter(
+            Item.title.ilike(f'%{term}%') |
+            Item.description.ilike(f'%{term}%') |
+            Item.tags.ilike(f'%{term}%')
+        )
+    return query
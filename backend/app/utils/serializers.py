@@ -0,0 +1,140 @@
+from collections import defaultdict
+from flask import url_for
+from app import db
+from app.models import Item, ItemImage, User
+
+
+UPLOADER_FIELDS = ('id', 'username', 'name')
+
+
+def load_item_images(item_ids, image_size=None):
+    """Fetch image URLs for many items in one query, keyed by item id.
+
+    With ``image_size`` ('thumb' or 'card') images that have a content
+    hash point at the cached derivative instead of the original.
+    """
+    images = defaultdict(list)
+    if not item_ids:
+        return images
+
+    rows = db.session.query(ItemImage.item_id, ItemImage.image_url, ItemImage.content_hash).filter(
+        ItemImage.item_id.in_(item_ids)
+    ).order_by(ItemImage.id).all()
+
+    for item_id, image_url, content_hash in rows:
+        if image_size and content_hash:
+            image_url = url_for('items.get_image_derivative', content_hash=content_hash,
+                                size=image_size, _external=True)
+        images[item_id].append(image_url)
+    return images
+
+
+def load_users(user_ids):
+    """Fetch many users in one query, keyed by user id"""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return {}
+    return {user.id: user for user in User.query.filter(User.id.in_(user_ids)).all()}
+
+
+def serialize_items(items, with_uploader=True, uploader_fields=UPLOADER_FIELDS, image_size=None):
+    """Serialize a page of items as cards.
+
+    Uploaders and images are loaded with one query each, so the cost
+    does not depend on how many items are on the page.
+    """
+    if not items:
+        return []
+
+    images = load_item_images([item.id for item in items], image_size)
+    uploaders = load_users(item.uploader_id for item in items) if with_uploader else {}
+
+    items_data = []
+    for item in items:
+        item_data = {
+            "id": item.id,
+            "title": item.title,
+            "description": item.description,
+            "category": item.category,
+            "type": item.type,
+            "size": item.size,
+            "condition": item.condition,
+            "tags": item.tags,
+            "status": item.status,
+            "approved": item.approved,
+            "created_at": item.created_at.isoformat(),
+            "images": images[item.id]
+        }
+
+        if with_uploader:
+            uploader = uploaders.get(item.uploader_id)
+            item_data["uploader"] = {
+                field: getattr(uploader, field) for field in uploader_fields
+            } if uploader else None
+
+        items_data.append(item_data)
+
+    return items_data
+
+
+def serialize_item(item, **kwargs):
+    """Serialize a single item using the same card format"""
+    return serialize_items([item], **kwargs)[0]
+
+
+def swap_item_summary(item):
+    return {
+        "id": item.id,
+        "title": item.title,
+        "category": item.category,
+        "condition": item.condition
+    } if item else None
+
+
+def serialize_swaps(swaps, with_requester=False, with_owner=False):
+    """Serialize a page of swaps with their items.
+
+    Requested and offered items come from one query, and requesters or
+    item owners from one more, however many swaps are on the page.
+    """
+    if not swaps:
+        return []
+
+    item_ids = {swap.requested_item_id for swap in swaps}
+    item_ids.update(swap.offered_item_id for swap in swaps if swap.offered_item_id)
+    items = {item.id: item for item in Item.query.filter(Item.id.in_(item_ids)).all()}
+
+    user_ids = set()
+    if with_requester:
+        user_ids.update(swap.requester_id for swap in swaps)
+    if with_owner:
+        user_ids.update(item.uploader_id for item in items.values())
+    users = load_users(user_ids)
+
+    swap_data = []
+    for swap in swaps:
+        requested_item = items.get(swap.requested_item_id)
+        swap_item = {
+            "id": swap.id,
+            "swap_type": swap.swap_type,
+            "status": swap.status,
+            "created_at": swap.created_at.isoformat(),
+            "requested_item": swap_item_summary(requested_item),
+            "offered_item": swap_item_summary(items.get(swap.offered_item_id))
+        }
+
+        if with_owner and requested_item:
+            owner = users.get(requested_item.uploader_id)
+            swap_item["requested_item"]["uploader"] = owner.username if owner else None
+
+        if with_requester:
+            requester = users.get(swap.requester_id)
+            swap_item["requester"] = {
+                "id": requester.id,
+                "username": requester.username,
+                "name": requester.name
+            } if requester else None
+
+        swap_data.append(swap_item)
+
+    return swap_data
@@ -0,0 +1,143 @@
+import threading
+import time
+import click
+from sqlalchemy import update, case, func
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import StatsCounter, User, Item, Swap
+from config import Config
+
+
+_lock = threading.Lock()
+_cache = {'dashboard': None, 'expires': 0.0}
+
+
+def category_counter(category):
+    return f"category:{category}"
+
+
+def item_counters(item, sign=1):
+    """Counter changes for adding (sign=1) or removing (sign=-1) an item"""
+    changes = {'items': sign, category_counter(item.category): sign}
+    if not item.approved:
+        changes['items_pending'] = sign
+    return changes
+
+
+def bump_counters(changes):
+    """Apply ``{name: delta}`` in the current transaction.
+
+    One UPDATE moves every existing counter; counters seen for the first
+    time are inserted. Call before committing the write they describe.
+    """
+    changes = {name: delta for name, delta in changes.items() if delta}
+    if not changes:
+        return
+
+    updated = {name for (name,) in db.session.execute(
+        update(StatsCounter).where(StatsCounter.name.in_(changes)).values(
+            value=StatsCounter.value + case(changes, value=StatsCounter.name)
+        ).returning(StatsCounter.name),
+        execution_options={"synchronize_session": False}
+    )}
+
+    for name in set(changes) - updated:
+        try:
+            with db.session.begin_nested():
+                db.session.add(StatsCounter(name=name, value=changes[name]))
+        except IntegrityError:
+            # Created concurrently; add to it instead
+            db.session.execute(
+                update(StatsCounter).where(StatsCounter.name == name).values(
+                    value=StatsCounter.value + changes[name]
+                ),
+                execution_options={"synchronize_session": False}
+            )
+
+
+def compute_counters():
+    """Count everything from the tables; used to seed and check the counters"""
+    counters = {
+        'users': db.session.query(func.count(User.id)).scalar(),
+        'items': db.session.query(func.count(Item.id)).scalar(),
+        'items_pending': db.session.query(func.count(Item.id)).filter(Item.approved.is_not(True)).scalar(),
+        'swaps': db.session.query(func.count(Swap.id)).scalar(),
+        'swaps_completed': db.session.query(func.count(Swap.id)).filter(Swap.status == 'accepted').scalar(),
+    }
+    for category, count in db.session.query(Item.category, func.count(Item.id)).group_by(Item.category):
+        counters[category_counter(category)] = count
+    return counters
+
+
+def load_dashboard():
+    """Dashboard payload: stored counters plus one join each for recent items and swaps"""
+    counters = dict(db.session.query(StatsCounter.name, StatsCounter.value).all())
+
+    recent_items = db.session.query(Item, User.username).join(
+        User, Item.uploader_id == User.id
+    ).order_by(Item.created_at.desc()).limit(5).all()
+    recent_swaps = db.session.query(Swap, User.username).join(
+        User, Swap.requester_id == User.id
+    ).order_by(Swap.created_at.desc()).limit(5).all()
+
+    prefix = category_counter('')
+    return {
+        "stats": {
+            "total_users": counters.get('users', 0),
+            "total_items": counters.get('items', 0),
+            "pending_items": counters.get('items_pending', 0),
+            "total_swaps": counters.get('swaps', 0),
+            "completed_swaps": counters.get('swaps_completed', 0)
+        },
+        "recent_items": [{
+            "id": item.id,
+            "title": item.title,
+            "category": item.category,
+            "status": item.status,
+            "approved": item.approved,
+            "created_at": item.created_at.isoformat(),
+            "uploader": username
+        } for item, username in recent_items],
+        "recent_swaps": [{
+            "id": swap.id,
+            "swap_type": swap.swap_type,
+            "status": swap.status,
+            "created_at": swap.created_at.isoformat(),
+            "requester": username
+        } for swap, username in recent_swaps],
+        "category_stats": [{
+            "category": name[len(prefix):],
+            "count": count
+        } for name, count in sorted(counters.items()) if name.startswith(prefix) and count > 0]
+    }
+
+
+def get_dashboard():
+    """Dashboard payload, cached for DASHBOARD_CACHE_TTL seconds"""
+    dashboard = _cache['dashboard']
+    if dashboard is not None and time.monotonic() < _cache['expires']:
+        return dashboard
+
+    with _lock:
+        if _cache['dashboard'] is None or time.monotonic() >= _cache['expires']:
+            _cache['dashboard'] = load_dashboard()
+            _cache['expires'] = time.monotonic() + Config.DASHBOARD_CACHE_TTL
+        return _cache['dashboard']
+
+
+@click.command('rebuild-stats')
+@click.option('--check', is_flag=True, help='Only report counters that differ from the tables.')
+def rebuild_stats_command(check):
+    """Recount the dashboard counters from the tables."""
+    expected = compute_counters()
+    stored = dict(db.session.query(StatsCounter.name, StatsCounter.value).all())
+    drift = {name: (stored.get(name, 0), value) for name, value in expected.items() if stored.get(name, 0) != value}
+    drift.update({name: (value, 0) for name, value in stored.items() if name not in expected and value})
+    for name, (value, correct) in sorted(drift.items()):
+        click.echo(f"{name}: stored {value}, counted {correct}")
+
+    if not check:
+        db.session.query(StatsCounter).delete()
+        db.session.add_all(StatsCounter(name=name, value=value) for name, value in expected.items())
+        db.session.commit()
+    click.echo(f"{len(drift)} counter(s) differed{'' if check else '; rebuilt'}")
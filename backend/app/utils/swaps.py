@@ -0,0 +1,138 @@
+from datetime import datetime
+from sqlalchemy import update, and_, or_, tuple_
+from app import db
+from app.models import Swap, Item, Redemption
+from app.utils.points import refund_swaps
+
+
+class SwapConflict(Exception):
+    """Raised when a swap or item changed between reading and updating it"""
+
+
+def swap_item_ids(swap):
+    return [item_id for item_id in (swap.requested_item_id, swap.offered_item_id) if item_id]
+
+
+def close_pending_swaps(condition, status='rejected', reason='swap_refund'):
+    """Move every pending swap matching ``condition`` to ``status``.
+
+    One UPDATE closes the swaps (bumping their versions, so a concurrent
+    accept of any of them fails its compare-and-set) and the points swaps
+    among them are refunded in bulk. Returns the closed swap ids.
+    """
+    closed = db.session.execute(
+        update(Swap).where(Swap.status == 'pending', condition).values(
+            status=status,
+            version=Swap.version + 1,
+            updated_at=datetime.utcnow()
+        ).returning(Swap.id, Swap.swap_type),
+        execution_options={"synchronize_session": False}
+    ).all()
+
+    refund_swaps([swap_id for swap_id, swap_type in closed if swap_type == 'points'], reason)
+    return [swap_id for swap_id, swap_type in closed]
+
+
+def reject_competing_swaps(swap):
+    """Reject the other pending swaps that involve either item of an accepted swap"""
+    item_ids = swap_item_ids(swap)
+    return close_pending_swaps(and_(
+        Swap.id != swap.id,
+        or_(Swap.requested_item_id.in_(item_ids), Swap.offered_item_id.in_(item_ids))
+    ))
+
+
+def respond_in_bulk(user_id, responses):
+    """Accept or reject many received swaps with set-based statements.
+
+    ``responses`` is a list of ``(swap_id, action)``. Each swap is checked
+    as respond_to_swap would; an accept that would hand out an item already
+    accepted earlier in the batch is rejected, like any other competitor. Swaps are updated with compare-and-set
+    on their loaded versions and items on their available status, so if
+    anything changed underneath, SwapConflict is raised and the caller
+    should roll back and retry.
+
+    Returns ``(results, swapped_item_ids, closed_swap_ids)``; results are
+    dicts in request order. Nothing is committed.
+    """
+    swaps = {swap.id: swap for swap in Swap.query.filter(
+        Swap.id.in_({swap_id for swap_id, action in responses})
+    ).all()}
+    items = {item.id: item for item in Item.query.filter(
+        Item.id.in_({item_id for swap in swaps.values() for item_id in swap_item_ids(swap)})
+    ).all()} if swaps else {}
+
+    results, seen, claimed = [], set(), set()
+    accepted, rejected = [], []
+    for swap_id, action in responses:
+        swap = swaps.get(swap_id)
+        requested_item = items.get(swap.requested_item_id) if swap else None
+        result = {"swap_id": swap_id, "action": action, "success": False}
+        results.append(result)
+
+        if swap_id in seen:
+            result.update(code=400, message="Duplicate swap in batch")
+        elif not swap or not requested_item:
+            result.update(code=404, message="Swap request not found")
+        elif requested_item.uploader_id != user_id:
+            result.update(code=403, message="Unauthorized")
+        elif swap.status != 'pending':
+            result.update(code=400, message="Swap request already processed")
+        elif action == 'reject':
+            rejected.append(swap)
+            result.update(success=True, code=200, status='rejected')
+        elif any(items.get(item_id) is None or items[item_id].status != 'available'
+                 for item_id in swap_item_ids(swap)):
+            result.update(code=409, message="Item is no longer available")
+        elif claimed.intersection(swap_item_ids(swap)):
+            # Closed below with the other competitors of the accepted swap
+            result.update(success=True, code=200, status='rejected',
+                          message="Another swap for this item was accepted")
+        else:
+            claimed.update(swap_item_ids(swap))
+            accepted.append(swap)
+            result.update(success=True, code=200, status='accepted')
+        seen.add(swap_id)
+
+    closed_swap_ids = []
+    if rejected:
+        closed_swap_ids += close_pending_swaps(
+            tuple_(Swap.id, Swap.version).in_([(swap.id, swap.version) for swap in rejected])
+        )
+        if len(closed_swap_ids) != len(rejected):
+            raise SwapConflict()
+
+    if accepted:
+        now = datetime.utcnow()
+        done = db.session.execute(
+            update(Swap).where(
+                tuple_(Swap.id, Swap.version).in_([(swap.id, swap.version) for swap in accepted]),
+                Swap.status == 'pending'
+            ).values(status='accepted', version=Swap.version + 1, updated_at=now).returning(Swap.id),
+            execution_options={"synchronize_session": False}
+        ).all()
+        swapped = db.session.execute(
+            update(Item).where(
+                Item.id.in_(claimed),
+                Item.status == 'available'
+            ).values(status='swapped', version=Item.version + 1, updated_at=now).returning(Item.id),
+            execution_options={"synchronize_session": False}
+        ).all()
+        if len(done) != len(accepted) or len(swapped) != len(claimed):
+            raise SwapConflict()
+
+        accepted_ids = [swap.id for swap in accepted]
+        db.session.execute(
+            update(Redemption).where(
+                Redemption.swap_id.in_([swap.id for swap in accepted if swap.swap_type == 'points']),
+                Redemption.status == 'pending'
+            ).values(status='completed'),
+            execution_options={"synchronize_session": False}
+        )
+        closed_swap_ids += accepted_ids
+        closed_swap_ids += close_pending_swaps(and_(
+            Swap.id.notin_(accepted_ids),
+            or_(Swap.requested_item_id.in_(claimed), Swap.offered_item_id.in_(claimed))
+        ))
+
+    return results, claimed, closed_swap_ids
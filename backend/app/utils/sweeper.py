@@ -0,0 +1,79 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import click
+from app import db
+from app.models import Swap
+from app.utils.events import publish_swap_events
+from app.utils.matching import swaps_closed
+from app.utils.swaps import close_pending_swaps
+from config import Config
+
+
+_state = {'thread': None}
+_state_lock = threading.Lock()
+
+
+def expire_stale_swaps(ttl_days=None, batch_size=None):
+    """Expire pending swaps older than the TTL and refund their held points.
+
+    Works in batches of the oldest stale swaps, each its own short
+    transaction: one UPDATE closes the batch and the points swaps in it are
+    refunded set-based. Every statement re-checks status = 'pending', so a
+    swap answered in the meantime is simply skipped. Returns how many swaps
+    were expired.
+    """
+    ttl_days = Config.SWAP_TTL_DAYS if ttl_days is None else ttl_days
+    batch_size = batch_size or Config.SWAP_SWEEP_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(days=ttl_days)
+
+    expired = 0
+    while True:
+        swap_ids = [swap_id for (swap_id,) in db.session.query(Swap.id).filter(
+            Swap.status == 'pending',
+            Swap.created_at < cutoff
+        ).order_by(Swap.created_at).limit(batch_size)]
+        if not swap_ids:
+            break
+
+        closed = close_pending_swaps(Swap.id.in_(swap_ids), status='expired', reason='swap_expired')
+        db.session.commit()
+        swaps_closed(closed)
+        publish_swap_events('swap_expired', closed)
+        expired += len(closed)
+
+        if len(swap_ids) < batch_size:
+            break
+    return expired
+
+
+def start_sweeper(app):
+    """Run expire_stale_swaps every SWAP_SWEEP_INTERVAL seconds in a daemon thread"""
+    interval = app.config['SWAP_SWEEP_INTERVAL']
+    if interval <= 0:
+        return
+
+    def sweep_forever():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    expired = expire_stale_swaps()
+                    if expired:
+                        app.logger.info("Expired %s stale swap request(s)", expired)
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error("Swap sweep failed: %s", e)
+
+    with _state_lock:
+        if _state['thread'] is None:
+            _state['thread'] = threading.Thread(target=sweep_forever, name='swap-sweeper', daemon=True)
+            _state['thread'].start()
+
+
+@click.command('expire-swaps')
+@click.option('--ttl-days', type=int, default=None, help='Age in days after which pending swaps expire.')
+def expire_swaps_command(ttl_days):
+    """Expire stale pending swaps and refund their points now."""
+    expired = expire_stale_swaps(ttl_days=ttl_days)
+    click.echo(f"Expired {expired} pending swap request(s)")
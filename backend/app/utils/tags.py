@@ -0,0 +1,91 @@
+from sqlalchemy import select, func, update
+from app import db
+from app.models import Item, Tag, item_tags
+
+
+MAX_TAG_LENGTH = 50
+
+
+def parse_tags(tags):
+    """Split a comma-separated tags string into unique, lowercase names"""
+    names = []
+    for name in (tags or '').split(','):
+        name = name.strip().lower()[:MAX_TAG_LENGTH]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def get_or_create_tags(names):
+    """Return Tag rows for the given names, creating the missing ones"""
+    if not names:
+        return []
+    existing = {tag.name: tag for tag in Tag.query.filter(Tag.name.in_(names)).all()}
+    for name in names:
+        if name not in existing:
+            existing[name] = Tag(name=name, item_count=0)
+            db.session.add(existing[name])
+    return [existing[name] for name in names]
+
+
+def set_item_tags(item, tags):
+    """Point the item's tag index at the tags in a comma-separated string"""
+    item.tag_list = get_or_create_tags(parse_tags(tags))
+
+
+def item_tag_ids(item_ids):
+    """Tag ids attached to any of the given items"""
+    if not item_ids:
+        return []
+    return db.session.execute(
+        select(item_tags.c.tag_id).where(item_tags.c.item_id.in_(item_ids)).distinct()
+    ).scalars().all()
+
+
+def refresh_tag_counts(tag_ids):
+    """Recount listed items for the given tags in one UPDATE.
+
+    Only the item_tags rows of these tags are visited, so the cost follows
+    the size of the touched tags rather than the whole catalog. Call it
+    after any write that changes an item's tags, approval or status.
+    """
+    if not tag_ids:
+        return
+    db.session.flush()
+    listed = select(func.count()).select_from(item_tags).join(
+        Item, Item.id == item_tags.c.item_id
+    ).where(
+        item_tags.c.tag_id == Tag.id,
+        Item.approved.is_(True),
+        Item.status == 'available'
+    ).scalar_subquery()
+    db.session.execute(
+        update(Tag).where(Tag.id.in_(tag_ids)).values(item_count=listed),
+        execution_options={"synchronize_session": False}
+    )
+
+
+def filter_by_tags(query, names, match_all=True):
+    """Restrict an Item query to items carrying all (or any) of the tags"""
+    names = parse_tags(','.join(names))
+    if not names:
+        return query
+
+    tagged = select(item_tags.c.item_id).join(
+        Tag, Tag.id == item_tags.c.tag_id
+    ).where(Tag.name.in_(names))
+
+    if match_all:
+        tagged = tagged.group_by(item_tags.c.item_id).having(
+            func.count(item_tags.c.tag_id) == len(names)
+        )
+    return query.filter(Item.id.in_(tagged))
+
+
+def tag_facets(limit=50, prefix=None):
+    """Most used tags with their listed-item counts, read from tags only"""
+    query = Tag.query.filter(Tag.item_count > 0)
+    if prefix:
+        query = query.filter(Tag.name.startswith(prefix.strip().lower(), autoescape=True))
+    tags = query.order_by(Tag.item_count.desc(), Tag.name).limit(limit).all()
+    return [{"tag": tag.name, "count": tag.item_count} for tag in tags]
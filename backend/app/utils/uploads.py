@@ -0,0 +1,119 @@
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from uuid import uuid4
+import cloudinary.uploader
+from werkzeug.utils import secure_filename
+from app.utils.metrics import timed
+from config import Config
+
+
+class ImageUploadTimeout(Exception):
+    """Raised for images that did not finish before the request deadline"""
+
+
+def cloudinary_upload(data, filename, timeout=None):
+    """Upload image bytes to Cloudinary and return the secure URL"""
+    uploaded = cloudinary.uploader.upload(io.BytesIO(data), filename=filename, timeout=timeout)
+    return uploaded.get('secure_url')
+
+
+def local_storage(folder, base_url):
+    """Filesystem stand-in for Cloudinary, for local development"""
+    os.makedirs(folder, exist_ok=True)
+
+    def upload(data, filename, timeout=None):
+        name = f"{uuid4().hex}_{secure_filename(filename) or 'image'}"
+        with open(os.path.join(folder, name), 'wb') as image_file:
+            image_file.write(data)
+        return f"{base_url}/{name}"
+
+    return upload
+
+
+# Storage function used by store_images(); picked by configure_storage()
+_uploader = {'upload': cloudinary_upload}
+
+_executor_lock = threading.Lock()
+_executor = {'pool': None}
+
+
+def set_uploader(upload):
+    """Replace the function that stores one image and returns its URL.
+
+    It is called as ``upload(data, filename, timeout=seconds)`` and should
+    give up once ``timeout`` has passed.
+    """
+    _uploader['upload'] = upload
+
+
+def upload_folder(app):
+    """Absolute UPLOAD_FOLDER; relative paths are taken from the backend folder"""
+    return os.path.join(os.path.dirname(app.root_path), app.config['UPLOAD_FOLDER'])
+
+
+def configure_storage(app):
+    """Select the image store named by IMAGE_STORAGE ('cloudinary' or 'local')"""
+    if app.config['IMAGE_STORAGE'] == 'local':
+        set_uploader(local_storage(
+            os.path.join(upload_folder(app), 'images'),
+            app.config['LOCAL_STORAGE_URL'].rstrip('/') + '/images'
+        ))
+    else:
+        set_uploader(cloudinary_upload)
+
+
+def get_uploader():
+    return _uploader['upload']
+
+
+def get_executor():
+    """Shared, bounded thread pool for image uploads"""
+    if _executor['pool'] is None:
+        with _executor_lock:
+            if _executor['pool'] is None:
+                _executor['pool'] = ThreadPoolExecutor(
+                    max_workers=Config.UPLOAD_WORKERS,
+                    thread_name_prefix='image-upload'
+                )
+    return _executor['pool']
+
+
+def store_images(images, timeout=None):
+    """Store ``(data, filename)`` pairs concurrently.
+
+    Callers pass bytes rather than request files, so workers never touch
+    the request stream. Returns one ``(url, error)`` pair per image, in the
+    order given; images still running when ``timeout`` (default
+    UPLOAD_TIMEOUT seconds) expires fail with ImageUploadTimeout.
+
+    Running uploads cannot be cancelled, so each one gets only the time
+    left until the deadline, and one that waited it out in the queue is
+    skipped. Abandoned work never holds the shared pool past the deadline.
+    """
+    timeout = Config.UPLOAD_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    upload = timed(Config.IMAGE_STORAGE, get_uploader())
+    executor = get_executor()
+
+    def upload_before_deadline(data, filename):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ImageUploadTimeout(f"Upload did not start within {timeout}s")
+        return upload(data, filename, timeout=remaining)
+
+    futures = [executor.submit(upload_before_deadline, data, filename) for data, filename in images]
+    wait(futures, timeout=timeout)
+
+    results = []
+    for future in futures:
+        if not future.done():
+            future.cancel()
+            results.append((None, ImageUploadTimeout(f"Upload did not finish within {timeout}s")))
+        elif future.exception():
+            results.append((None, future.exception()))
+        else:
+            results.append((future.result(), None))
+    return results
@@ -0,0 +1,162 @@
+"""Accuracy and latency of the hourly/daily activity rollups.
+
+First drives uploads, moderation (single and bulk), swap requests and
+accepts (single and bulk) through the API, then checks that the rollups
+kept incrementally match a fresh ``flask backfill-rollups``.
+
+Then loads BENCH_ROLLUP_DAYS (default 730) days of synthetic hourly and
+daily rollups for every metric and five categories and times GET
+/api/admin/analytics over a range of date ranges. Exits non-zero if the
+rollups drift or a query is slower than BENCH_MAX_MS (default 50).
+"""
+import io
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert, delete
+from benchmarks.common import make_app, auth_headers, seed_users, image_bytes
+from app import db
+from app.models import ActivityRollup, Item
+from app.utils.rollups import bucket_start, METRICS, PERIODS
+from app.utils.uploads import set_uploader
+
+
+DAYS = int(os.getenv('BENCH_ROLLUP_DAYS', 730))
+MAX_MS = float(os.getenv('BENCH_MAX_MS', 50))
+CATEGORIES = ('Tops', 'Bottoms', 'Shoes', 'Outerwear', 'Accessories')
+RUNS = 20
+
+
+def stored_rollups():
+    return {(row.period, row.bucket_start, row.metric, row.category): row.count
+            for row in ActivityRollup.query.all()}
+
+
+def drive_writes(app, client):
+    """Exercise every write that feeds the rollups"""
+    with app.app_context():
+        admin, *users = seed_users(7, points_balance=100)
+        admin.is_admin = True
+        db.session.commit()
+        ids = [user.id for user in users]
+        headers = {user_id: auth_headers(user_id) for user_id in ids + [admin.id]}
+        as_admin = headers[admin.id]
+
+    for n in range(30):
+        user_id = ids[n % len(ids)]
+        response = client.post('/api/items/upload', headers=headers[user_id], content_type='multipart/form-data', data={
+            "name": f"Item {n}",
+            "category": CATEGORIES[n % len(CATEGORIES)],
+            "mainImage": (io.BytesIO(image_bytes(n, size=(32, 32))), 'main.jpg'),
+        })
+        assert response.status_code == 201, response.get_json()
+
+    with app.app_context():
+        items = {user_id: [item.id for item in Item.query.filter_by(uploader_id=user_id).order_by(Item.id)]
+                 for user_id in ids}
+
+    for owned in items.values():
+        client.post(f'/api/admin/items/{owned[0]}/moderate', headers=as_admin, json={"action": 'approve'})
+    client.post('/api/admin/items/moderate', headers=as_admin, json={"items": [
+        {"item_id": item_id, "action": 'approve'} for owned in items.values() for item_id in owned[1:4]
+    ] + [{"item_id": items[ids[0]][4], "action": 'reject'}, {"item_id": items[ids[1]][4], "action": 'remove'}]})
+
+    swaps = []
+    for requester, owner in zip(ids, ids[1:] + ids[:1]):
+        for item_id in items[owner][:3]:
+            response = client.post('/api/swap/request', headers=headers[requester], json={
+                "requested_item_id": item_id, "swap_type": 'points', "points_used": 5
+            })
+            assert response.status_code == 201, response.get_json()
+            swaps.append((owner, response.get_json()['swap_id']))
+
+    by_owner = {}
+    for owner, swap_id in swaps:
+        by_owner.setdefault(owner, []).append(swap_id)
+    for owner, swap_ids in by_owner.items():
+        client.post(f'/api/swap/{swap_ids[0]}/respond', headers=headers[owner], json={"action": 'accept'})
+        client.post('/api/swap/respond', headers=headers[owner], json={"swaps": [
+            {"swap_id": swap_ids[1], "action": 'accept'}, {"swap_id": swap_ids[2], "action": 'reject'}
+        ]})
+    return admin.id
+
+
+def load_synthetic(days):
+    """Replace the rollups with ``days`` days of hourly and daily rows"""
+    end = bucket_start(datetime.utcnow(), 'day') + timedelta(days=1)
+    db.session.execute(delete(ActivityRollup))
+    for period, step in PERIODS.items():
+        buckets = int(timedelta(days=days) / step)
+        for first in range(0, buckets, 500):
+            db.session.execute(insert(ActivityRollup), [
+                {"period": period, "bucket_start": end - step * (n + 1), "metric": metric,
+                 "category": category, "count": (n + len(metric) + len(category)) % 7}
+                for n in range(first, min(first + 500, buckets))
+                for metric in METRICS
+                for category in CATEGORIES
+            ])
+    db.session.commit()
+    return db.session.query(ActivityRollup).count()
+
+
+def main():
+    problems = []
+    app = make_app()
+    set_uploader(lambda data, filename, timeout=None: f"https://fake.example.com/{len(data)}/{filename}")
+    client = app.test_client()
+
+    admin_id = drive_writes(app, client)
+    with app.app_context():
+        incremental = stored_rollups()
+        result = app.test_cli_runner().invoke(args=['backfill-rollups'])
+        assert result.exit_code == 0, result.output
+        rebuilt = stored_rollups()
+        headers = auth_headers(admin_id)
+
+    drift = {key for key in incremental.keys() | rebuilt.keys() if incremental.get(key) != rebuilt.get(key)}
+    totals = {}
+    for (period, bucket, metric, category), count in rebuilt.items():
+        if period == 'day':
+            totals[metric] = totals.get(metric, 0) + count
+    print(f"incremental vs backfill: {len(rebuilt)} rows, {len(drift)} differ ({result.output.strip()})")
+    print("  " + ", ".join(f"{metric} {count}" for metric, count in sorted(totals.items())))
+    if drift or not rebuilt:
+        problems.append("incremental rollups differ from the backfill")
+
+    with app.app_context():
+        rows = load_synthetic(DAYS)
+    print(f"loaded {rows} synthetic rollup rows covering {DAYS} days")
+
+    today = bucket_start(datetime.utcnow(), 'day')
+    queries = [
+        ("1 year by day, one metric", 'day', 365, '&metric=items_listed'),
+        ("90 days by day, every metric", 'day', 90, ''),
+        ("30 days by day, one metric", 'day', 30, '&metric=swaps_accepted'),
+        ("30 days by day, one category", 'day', 30, '&category=Tops'),
+        ("7 days by hour, one metric", 'hour', 7, '&metric=items_listed'),
+        ("80 days by hour, one metric", 'hour', 80, '&metric=swaps_accepted&category=Shoes'),
+    ]
+    for label, interval, days, extra in queries:
+        start = (today - timedelta(days=days)).isoformat()
+        url = f'/api/admin/analytics?interval={interval}&start={start}&end={(today + timedelta(days=1)).isoformat()}{extra}'
+        timings = []
+        for _ in range(RUNS):
+            began = time.perf_counter()
+            response = client.get(url, headers=headers)
+            timings.append((time.perf_counter() - began) * 1000)
+        body = response.get_json()
+        assert response.status_code == 200, body
+        median = statistics.median(timings)
+        print(f"{label:32} {len(body['series']):6} points  p50 {median:6.1f} ms")
+        if median > MAX_MS:
+            problems.append(f"{label} took {median:.1f} ms")
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
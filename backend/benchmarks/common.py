@@ -0,0 +1,111 @@
+"""Shared helpers for the benchmark scripts.
+
+Run the scripts from the backend folder, e.g.
+
+    python -m benchmarks.item_queries
+"""
+import io
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+# Point the app at a throwaway database before config is imported
+_db_dir = tempfile.mkdtemp(prefix='rewear-bench-')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_db_dir, 'bench.db'))
+
+from PIL import Image
+from sqlalchemy import event
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models import User, Item, ItemImage, Tag
+from app.utils.tags import set_item_tags, refresh_tag_counts
+
+
+def make_app():
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['UPLOAD_FOLDER'] = os.path.join(_db_dir, 'uploads')
+    return app
+
+
+@contextmanager
+def count_queries():
+    """Count SQL statements executed inside the block"""
+    counter = {'count': 0}
+
+    def before_cursor_execute(*args):
+        counter['count'] += 1
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@contextmanager
+def timer(label):
+    start = time.perf_counter()
+    yield
+    print(f"{label}: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+def image_bytes(seed, size=(1200, 1600)):
+    """A real JPEG whose colour (and so content hash) depends on ``seed``"""
+    output = io.BytesIO()
+    color = tuple((seed * factor) % 256 for factor in (37, 91, 151))
+    Image.new('RGB', size, color).save(output, format='JPEG')
+    return output.getvalue()
+
+
+def auth_headers(user_id):
+    token = create_access_token(identity=str(user_id))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def seed_users(count, **fields):
+    users = [
+        User(
+            username=f"user{i}",
+            name=f"User {i}",
+            email=f"user{i}@example.com",
+            password_hash='x',
+            **fields
+        )
+        for i in range(count)
+    ]
+    db.session.add_all(users)
+    db.session.commit()
+    return users
+
+
+def seed_items(users, per_user, images_per_item=2, categories=('Tops', 'Bottoms', 'Shoes')):
+    items = []
+    for user in users:
+        for i in range(per_user):
+            items.append(Item(
+                title=f"Item {user.id}-{i}",
+                description="A gently used piece of clothing",
+                category=categories[i % len(categories)],
+                type='General',
+                size='M',
+                condition='Good',
+                tags='cotton,summer',
+                status='available',
+                approved=True,
+                uploader_id=user.id
+            ))
+    db.session.add_all(items)
+    for item in items:
+        set_item_tags(item, item.tags)
+    db.session.flush()
+    refresh_tag_counts([tag.id for tag in Tag.query.all()])
+    db.session.add_all(
+        ItemImage(item_id=item.id, image_url=f"https://example.com/{item.id}/{n}.jpg")
+        for item in items
+        for n in range(images_per_item)
+    )
+    db.session.commit()
+    return items
@@ -0,0 +1,90 @@
+"""Memory and throughput of the streaming admin exports.
+
+Streams the swaps export as CSV and NDJSON through the real endpoint,
+first with a tenth of BENCH_ROWS (default 1,000,000) swaps seeded and
+then with all of them. Peak Python memory (tracemalloc) must stay flat
+as the row count grows tenfold; exits non-zero if it grows more than 2x
+or any row is missing.
+"""
+import os
+import sys
+import time
+import tracemalloc
+from benchmarks.common import make_app, auth_headers, seed_users, seed_items
+from app import db
+from app.models import Swap
+from config import Config
+
+
+ROWS = int(os.getenv('BENCH_ROWS', 1_000_000))
+
+
+def seed():
+    admin, requester, owner = seed_users(3)
+    admin.is_admin = True
+    items = seed_items([owner], per_user=20, images_per_item=0)
+    db.session.commit()
+    return admin.id, requester.id, [item.id for item in items]
+
+
+def add_swaps(count, requester_id, item_ids):
+    for start in range(0, count, 50_000):
+        db.session.execute(Swap.__table__.insert(), [
+            {"requester_id": requester_id, "requested_item_id": item_ids[n % len(item_ids)],
+             "swap_type": 'points', "status": 'pending'}
+            for n in range(start, min(start + 50_000, count))
+        ])
+    db.session.commit()
+
+
+def stream(client, headers, export_format):
+    """Consume an export chunk by chunk; returns (lines, bytes, seconds, peak bytes)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(f'/api/admin/export/swaps?format={export_format}', headers=headers, buffered=False)
+    lines = size = 0
+    for chunk in response.response:
+        chunk = chunk.encode() if isinstance(chunk, str) else chunk
+        lines += chunk.count(b'\n')
+        size += len(chunk)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return lines, size, elapsed, peak
+
+
+def main():
+    app = make_app()
+    client = app.test_client()
+    with app.app_context():
+        admin_id, requester_id, item_ids = seed()
+        headers = auth_headers(admin_id)
+
+    results = {}
+    for rows in (ROWS // 10, ROWS):
+        with app.app_context():
+            add_swaps(rows - db.session.query(Swap).count(), requester_id, item_ids)
+        for export_format in ('csv', 'ndjson'):
+            results[export_format, rows] = stream(client, headers, export_format)
+
+    problems = []
+    for (export_format, rows), (lines, size, elapsed, peak) in results.items():
+        print(f"{export_format:6} {rows:>9} rows  {size / 1e6:8.1f} MB  {elapsed:6.2f}s  "
+              f"{rows / elapsed:9.0f} rows/s  peak {peak / 1e6:6.2f} MB")
+        expected = rows + (export_format == 'csv')
+        if lines != expected:
+            problems.append(f"{export_format}: expected {expected} lines, got {lines}")
+
+    for export_format in ('csv', 'ndjson'):
+        small, large = results[export_format, ROWS // 10][3], results[export_format, ROWS][3]
+        if large > 2 * small:
+            problems.append(f"{export_format}: peak memory grew from {small} to {large} bytes")
+
+    print(f"chunk {Config.EXPORT_CHUNK_ROWS} rows, yield_per {Config.EXPORT_YIELD_PER}")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Wall-clock gain of concurrent image uploads in upload_item.
+
+Cloudinary is replaced by a fake uploader that sleeps for a fixed
+latency (BENCH_UPLOAD_LATENCY seconds, default 0.25), and items with a
+growing number of photos are posted the old way (one upload after the
+other) and through POST /api/items/upload.
+"""
+import io
+import os
+import time
+from benchmarks.common import make_app, auth_headers, seed_users, image_bytes
+from app.utils.uploads import set_uploader
+
+
+LATENCY = float(os.getenv('BENCH_UPLOAD_LATENCY', 0.25))
+PHOTO_COUNTS = (1, 3, 6)
+
+
+def fake_upload(data, filename, timeout=None):
+    time.sleep(LATENCY)
+    return f"https://fake.example.com/{len(data)}/{filename}"
+
+
+def form(photos):
+    # Distinct bytes per image and per run, so deduplication does not kick in
+    return {
+        "name": "Denim jacket",
+        "category": "Tops",
+        "mainImage": (io.BytesIO(image_bytes(photos * 100)), 'main.jpg'),
+        "additionalImages": [
+            (io.BytesIO(image_bytes(photos * 100 + n + 1)), f'extra{n}.jpg') for n in range(photos - 1)
+        ],
+    }
+
+
+def main():
+    app = make_app()
+    set_uploader(fake_upload)
+    with app.app_context():
+        user, = seed_users(1)
+        client = app.test_client()
+        headers = auth_headers(user.id)
+
+        print(f"fake upload latency {LATENCY * 1000:.0f} ms")
+        print(f"{'photos':>6} {'sequential ms':>14} {'upload_item ms':>15}")
+        for photos in PHOTO_COUNTS:
+            # What upload_item used to do: one blocking upload after another
+            start = time.perf_counter()
+            for n in range(photos):
+                fake_upload(b'', f'{n}.jpg')
+            sequential = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            response = client.post('/api/items/upload', data=form(photos), headers=headers,
+                                   content_type='multipart/form-data')
+            elapsed = (time.perf_counter() - start) * 1000
+            assert response.status_code == 201, response.get_json()
+            images = response.get_json()['item']['additionalImages']
+            assert [image.rsplit('/', 1)[1] for image in images] == [f"extra{n}.jpg" for n in range(photos - 1)]
+
+            print(f"{photos:6} {sequential:14.0f} {elapsed:15.0f}")
+
+
+if __name__ == '__main__':
+    main()
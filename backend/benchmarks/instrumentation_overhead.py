@@ -0,0 +1,65 @@
+"""Cost of the request instrumentation.
+
+Serves GET /api/items/ and GET /api/auth/me BENCH_REQUESTS (default 500)
+times each from an app with METRICS_ENABLED and from one without, and
+reports the median latency of both. Then checks that /metrics has the
+histograms for those endpoints, and that it refuses a scrape without
+METRICS_TOKEN; exits non-zero if not.
+"""
+import os
+import statistics
+import sys
+import time
+from benchmarks.common import make_app, auth_headers, seed_users, seed_items
+from config import Config
+
+
+REQUESTS = int(os.getenv('BENCH_REQUESTS', 500))
+URLS = ('/api/items/', '/api/auth/me')
+
+
+def medians(app, headers):
+    client = app.test_client()
+    results = {}
+    for url in URLS:
+        timings = []
+        for _ in range(REQUESTS):
+            start = time.perf_counter()
+            client.get(url, headers=headers)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[url] = statistics.median(timings)
+    return results
+
+
+def main():
+    Config.METRICS_LOG_SAMPLE_RATE = 0
+    Config.METRICS_ENABLED = False
+    plain = make_app()
+    Config.METRICS_ENABLED = True
+    Config.METRICS_TOKEN = 'bench'
+    instrumented = make_app()
+
+    with instrumented.app_context():
+        user, = seed_users(1)
+        seed_items([user], per_user=24, images_per_item=1)
+        headers = auth_headers(user.id)
+
+    off, on = medians(plain, headers), medians(instrumented, headers)
+    print(f"{'url':16} {'off p50':>9} {'on p50':>9} {'overhead':>9}")
+    for url in URLS:
+        print(f"{url:16} {off[url]:7.2f}ms {on[url]:7.2f}ms {on[url] - off[url]:7.2f}ms")
+
+    metrics_client = instrumented.test_client()
+    if metrics_client.get('/metrics').status_code != 401:
+        print("FAIL: /metrics served without the token")
+        sys.exit(1)
+    body = metrics_client.get('/metrics', headers={"Authorization": 'Bearer bench'}).get_data(as_text=True)
+    missing = [endpoint for endpoint in ('items.get_items', 'auth.get_current_user')
+               if f'http_request_duration_seconds_count{{blueprint="{endpoint.split(".")[0]}",endpoint="{endpoint}"' not in body]
+    for endpoint in missing:
+        print(f"FAIL: no request histogram for {endpoint}")
+    sys.exit(1 if missing else 0)
+
+
+if __name__ == '__main__':
+    main()
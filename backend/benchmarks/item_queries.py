@@ -0,0 +1,63 @@
+"""Check that the item endpoints run a fixed number of queries per page.
+
+Each endpoint is requested with growing page sizes; the script fails if
+the SQL statement count changes with the page size.
+"""
+import sys
+from benchmarks.common import make_app, count_queries, auth_headers, seed_users, seed_items
+from app import db
+from app.models import Item
+
+
+PAGE_SIZES = (12, 48, 96)
+
+
+def measure(client, url, headers=None):
+    # Warm the signed-in user cache so every size pays the same fixed cost
+    client.get(url.format(per_page=PAGE_SIZES[0]), headers=headers)
+    counts = []
+    for per_page in PAGE_SIZES:
+        db.session.expunge_all()
+        with count_queries() as counter:
+            response = client.get(url.format(per_page=per_page), headers=headers)
+        assert response.status_code == 200, response.get_json()
+        counts.append(counter['count'])
+    return counts
+
+
+def main():
+    app = make_app()
+    with app.app_context():
+        admin, *users = seed_users(20)
+        admin.is_admin = True
+        items = seed_items(users, per_user=10, images_per_item=3)
+        # Leave some items unapproved for the moderation queue
+        for item in items[::2]:
+            item.approved = False
+        db.session.commit()
+
+        client = app.test_client()
+        endpoints = {
+            'get_items': ('/api/items/?per_page={per_page}&show_all=true', None),
+            'get_my_items': ('/api/items/my-items?per_page={per_page}', auth_headers(users[0].id)),
+            'get_pending_items': ('/api/admin/items/pending?per_page={per_page}', auth_headers(admin.id)),
+        }
+
+        failed = False
+        for name, (url, headers) in endpoints.items():
+            counts = measure(client, url, headers)
+            constant = len(set(counts)) == 1
+            failed |= not constant
+            print(f"{name:20} queries per page size {dict(zip(PAGE_SIZES, counts))} {'ok' if constant else 'GROWS'}")
+
+        item_id = Item.query.first().id
+        db.session.expunge_all()
+        with count_queries() as counter:
+            client.get(f'/api/items/{item_id}')
+        print(f"{'get_item':20} queries {counter['count']}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
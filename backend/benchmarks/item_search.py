@@ -0,0 +1,82 @@
+"""Compare the full-text item search with the old ILIKE scan.
+
+Seeds 100k items (override with BENCH_ITEMS) and times a few searches
+through both paths, then through GET /api/items/?search=.
+"""
+import os
+import random
+import time
+from benchmarks.common import make_app, seed_users
+from app import db
+from app.models import Item
+from app.utils.search import apply_search
+
+
+ITEM_COUNT = int(os.getenv('BENCH_ITEMS', 100000))
+WORDS = ('denim', 'jacket', 'cotton', 'linen', 'shirt', 'summer', 'winter', 'wool',
+         'vintage', 'floral', 'dress', 'leather', 'boots', 'scarf', 'knit', 'silk')
+SYLLABLES = ('ka', 'lo', 'mi', 're', 'su', 'ta', 'vo', 'ne', 'pi', 'da')
+SEARCHES = ('denim', 'vint', 'floral dress', 'leather bo', 'wool scarf knit')
+RUNS = 20
+
+
+def vocabulary(rng, size=5000):
+    """Common clothing words plus filler words, so searches are selective"""
+    filler = {''.join(rng.choice(SYLLABLES) for _ in range(3)) for _ in range(size)}
+    return list(WORDS) + sorted(filler)
+
+
+def seed(users):
+    rng = random.Random(42)
+    words = vocabulary(rng)
+    rows = [{
+        "title": ' '.join(rng.sample(words, 3)).title(),
+        "description": ' '.join(rng.choice(words) for _ in range(20)),
+        "category": rng.choice(('Tops', 'Bottoms', 'Shoes', 'Accessories')),
+        "type": 'General',
+        "condition": 'Good',
+        "tags": ','.join(rng.sample(words, 2)),
+        "status": 'available',
+        "approved": True,
+        "uploader_id": rng.choice(users).id,
+    } for _ in range(ITEM_COUNT)]
+    db.session.execute(Item.__table__.insert(), rows)
+    db.session.commit()
+
+
+def old_search(query, search):
+    return query.filter(
+        Item.title.ilike(f'%{search}%') |
+        Item.description.ilike(f'%{search}%') |
+        Item.tags.ilike(f'%{search}%')
+    )
+
+
+def time_search(search_fn, search):
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        query = search_fn(Item.query.filter_by(approved=True, status='available'), search)
+        query.order_by(Item.created_at.desc()).limit(12).all()
+        query.order_by(None).count()
+    return (time.perf_counter() - start) * 1000 / RUNS
+
+
+def main():
+    app = make_app()
+    with app.app_context():
+        users = seed_users(50)
+        seed(users)
+        print(f"{ITEM_COUNT} items, {RUNS} runs per search (page + count)")
+        print(f"{'search':20} {'ilike ms':>10} {'fts ms':>10}")
+        for search in SEARCHES:
+            print(f"{search:20} {time_search(old_search, search):10.2f} {time_search(apply_search, search):10.2f}")
+
+        client = app.test_client()
+        start = time.perf_counter()
+        for search in SEARCHES:
+            assert client.get(f'/api/items/?search={search}').status_code == 200
+        print(f"GET /api/items/?search= average {(time.perf_counter() - start) * 1000 / len(SEARCHES):.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Login throughput, and browse latency while a login burst is running.
+
+BENCH_LOGIN_THREADS (default 8) threads each log in BENCH_LOGINS (default
+5) times, while one more thread keeps loading GET /api/items/. It runs
+once with hashing on the request threads (HASH_WORKERS=0, as before) and
+once through the worker processes. It reports logins per second, how many
+logins were turned away with 503, and browse latency during the burst.
+
+A hash stored with outdated parameters must be upgraded by its first
+login; exits non-zero if it is not, or if a login fails for any reason
+but 503.
+"""
+import os
+import statistics
+import sys
+import threading
+import time
+from werkzeug.security import generate_password_hash
+from benchmarks.common import make_app, seed_users, seed_items
+from app import db
+from app.models import User
+from app.utils.passwords import hash_password, needs_rehash
+from config import Config
+
+
+THREADS = int(os.getenv('BENCH_LOGIN_THREADS', 8))
+LOGINS = int(os.getenv('BENCH_LOGINS', 5))
+
+
+def percentile(values, fraction):
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def burst(app):
+    """Run the login threads and the browse thread; returns (seconds, statuses, browse latencies)"""
+    statuses, latencies = [], []
+    done = threading.Event()
+
+    def log_in(n):
+        client = app.test_client()
+        for _ in range(LOGINS):
+            response = client.post('/api/auth/login', json={"email": f"user{n}@example.com", "password": 'secret'})
+            statuses.append(response.status_code)
+
+    def browse():
+        client = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/api/items/')
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    browser = threading.Thread(target=browse)
+    browser.start()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=log_in, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    browser.join()
+    return elapsed, statuses, latencies
+
+
+def main():
+    problems = []
+    app = make_app()
+    workers = Config.HASH_WORKERS or 2
+
+    with app.app_context():
+        users = seed_users(THREADS)
+        password_hash = hash_password('secret')
+        for user in users:
+            user.password_hash = password_hash
+        # One user still has a hash from weaker parameters
+        users[0].password_hash = generate_password_hash('secret', method='pbkdf2:sha256:1000')
+        seed_items(users[:1], per_user=20, images_per_item=0)
+        db.session.commit()
+
+    client = app.test_client()
+    client.post('/api/auth/login', json={"email": 'user0@example.com', "password": 'secret'})
+    with app.app_context():
+        upgraded = not needs_rehash(User.query.filter_by(email='user0@example.com').first().password_hash)
+    print(f"outdated hash upgraded at login: {upgraded}")
+    if not upgraded:
+        problems.append("outdated hash was not upgraded")
+
+    print(f"{THREADS} threads x {LOGINS} logins, {Config.PASSWORD_HASH_METHOD}, {os.cpu_count()} CPU(s)")
+    print(f"{'hashing':>22} {'logins/s':>9} {'503s':>5} {'browse p50':>11} {'browse p99':>11}")
+    for label, hash_workers in (("on request threads", 0), (f"{workers} worker processes", workers)):
+        Config.HASH_WORKERS = hash_workers
+        elapsed, statuses, latencies = burst(app)
+        ok, busy = statuses.count(200), statuses.count(503)
+        print(f"{label:>22} {ok / elapsed:9.1f} {busy:5} {statistics.median(latencies):9.1f}ms "
+              f"{percentile(latencies, 0.99):9.1f}ms")
+        if ok + busy != len(statuses):
+            problems.append(f"{label}: unexpected statuses {sorted(set(statuses))}")
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
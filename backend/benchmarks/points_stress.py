@@ -0,0 +1,100 @@
+"""Multi-threaded stress test for the points balance.
+
+Threads hammer a handful of users through the real endpoints: points
+swap requests (debit), rejections (refund) and admin grants (credit).
+Afterwards every balance must equal the sum of its ledger and none may
+be negative. Exits non-zero on any drift.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from benchmarks.common import make_app, auth_headers, seed_users, seed_items
+from app import db
+from app.models import User, Swap, PointsLedger
+from app.utils.points import find_drift
+from config import Config
+
+# Writers queue on SQLite's lock instead of failing fast
+Config.SQLALCHEMY_ENGINE_OPTIONS = {"connect_args": {"timeout": 60}}
+
+
+THREADS = int(os.getenv('BENCH_THREADS', 8))
+OPS_PER_THREAD = int(os.getenv('BENCH_OPS', 100))
+USERS = 4
+STARTING_POINTS = 50
+
+
+def worker(app, seed, user_ids, owner_id, item_ids, admin_id, stats):
+    rng = random.Random(seed)
+    client = app.test_client()
+    with app.app_context():
+        user_headers = {user_id: auth_headers(user_id) for user_id in user_ids}
+        owner_headers, admin_headers = auth_headers(owner_id), auth_headers(admin_id)
+
+    for _ in range(OPS_PER_THREAD):
+        user_id = rng.choice(user_ids)
+        if rng.random() < 0.1:
+            response = client.post(f'/api/admin/users/{user_id}/add-points',
+                                   json={"points": rng.randint(1, 20)}, headers=admin_headers)
+            stats['grants'] += response.status_code == 200
+            continue
+
+        response = client.post('/api/swap/request', headers=user_headers[user_id], json={
+            "requested_item_id": rng.choice(item_ids),
+            "swap_type": 'points',
+            "points_used": rng.randint(1, 30)
+        })
+        if response.status_code != 201:
+            stats['declined'] += 1
+            continue
+        stats['holds'] += 1
+
+        if rng.random() < 0.5:
+            swap_id = response.get_json()['swap_id']
+            response = client.post(f'/api/swap/{swap_id}/respond', json={"action": 'reject'}, headers=owner_headers)
+            stats['refunds'] += response.status_code == 200
+
+
+def main():
+    app = make_app()
+    with app.app_context():
+        admin, owner, *users = seed_users(USERS + 2)
+        admin.is_admin = True
+        items = seed_items([owner], per_user=20, images_per_item=1)
+        db.session.commit()
+        user_ids, item_ids = [user.id for user in users], [item.id for item in items]
+        owner_id, admin_id = owner.id, admin.id
+        client = app.test_client()
+        for user_id in user_ids:
+            client.post(f'/api/admin/users/{user_id}/add-points', json={"points": STARTING_POINTS},
+                        headers=auth_headers(admin_id))
+
+    stats = {'holds': 0, 'refunds': 0, 'grants': 0, 'declined': 0}
+    threads = [threading.Thread(target=worker, args=(app, n, user_ids, owner_id, item_ids, admin_id, stats))
+               for n in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        drift = find_drift()
+        negative = User.query.filter(User.points_balance < 0).count()
+        ledger_rows = PointsLedger.query.count()
+        pending = Swap.query.filter_by(status='pending').count()
+
+    operations = THREADS * OPS_PER_THREAD
+    print(f"{THREADS} threads x {OPS_PER_THREAD} ops in {elapsed:.2f}s ({operations / elapsed:.0f} ops/s)")
+    print(f"holds {stats['holds']}, refunds {stats['refunds']}, grants {stats['grants']}, "
+          f"declined for insufficient points {stats['declined']}")
+    print(f"ledger rows {ledger_rows}, pending swaps {pending}")
+    print(f"drifted balances {len(drift)}, negative balances {negative}")
+    sys.exit(1 if drift or negative else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Query-plan regression check for the blueprint queries.
+
+Requests every read endpoint (and a few writes) against seeded data,
+captures the SELECTs they run and EXPLAINs each one. The script exits
+non-zero if any query on an application table falls back to a full
+table scan. Works on SQLite and, with DATABASE_URL pointing at a
+Postgres database, on Postgres (sequential scans are disabled while
+explaining, so any remaining Seq Scan means no usable index exists).
+
+    python -m benchmarks.query_plans
+"""
+import re
+import sys
+from sqlalchemy import event, text
+from benchmarks.common import make_app, auth_headers, seed_users, seed_items
+from app import db
+from app.models import Item, Swap, Redemption, AdminAction
+
+
+# Whole-table aggregates that are expected to read every row, by endpoint or by URL
+ALLOWED_SCANS = {
+    # A few dozen counter rows, read whole by design
+    'admin.admin_dashboard': {'stats_counters'},
+    # Ordering or filtering by a per-user count visits every user; the
+    # correlated counts themselves must still use the items and swaps indexes
+    '/api/admin/users?sort=items_count&min_swaps=1': {'users'},
+    '/api/admin/users?sort=swaps_count&order=asc&cursor=': {'users'},
+}
+
+
+def seed():
+    admin, *users = seed_users(30)
+    admin.is_admin = True
+    items = seed_items(users, per_user=10)
+    for item in items[::3]:
+        item.approved = False
+    for n, item in enumerate(items[1::3]):
+        requester = users[(n + 1) % len(users)]
+        offered = Item.query.filter_by(uploader_id=requester.id).first()
+        db.session.add(Swap(requester_id=requester.id, requested_item_id=item.id,
+                            offered_item_id=offered.id, swap_type='direct', status='pending'))
+        db.session.add(Swap(requester_id=requester.id, requested_item_id=item.id,
+                            offered_item_id=offered.id, swap_type='points', status='pending'))
+        db.session.add(Redemption(user_id=requester.id, item_id=item.id, points_used=10))
+        db.session.add(AdminAction(admin_id=admin.id, item_id=item.id, action='approve'))
+    db.session.commit()
+    return admin, users, items
+
+
+def endpoints(admin, users, items):
+    user = users[0]
+    owned = Item.query.filter_by(uploader_id=user.id).first()
+    swap = Swap.query.join(Item, Swap.requested_item_id == Item.id).filter(
+        Item.uploader_id == user.id, Swap.swap_type == 'points').first()
+    as_user, as_admin = auth_headers(user.id), auth_headers(admin.id)
+    return [
+        ('GET', '/api/items/', None, None),
+        ('GET', '/api/items/?category=Tops', None, None),
+        ('GET', '/api/items/?search=item', None, None),
+        ('GET', '/api/items/?tag=cotton&tag=summer', None, None),
+        ('GET', '/api/items/?cursor=', None, None),
+        ('GET', f'/api/items/{owned.id}', None, None),
+        ('GET', '/api/items/my-items', as_user, None),
+        ('GET', '/api/items/categories', None, None),
+        ('GET', '/api/items/tags', None, None),
+        ('GET', '/api/swap/my-requests', as_user, None),
+        ('GET', '/api/swap/received-requests', as_user, None),
+        ('GET', '/api/swap/cycles', as_user, None),
+        ('POST', f'/api/swap/{swap.id}/respond', as_user, {"action": "reject"}),
+        ('GET', '/api/auth/me', as_user, None),
+        ('GET', '/api/admin/dashboard', as_admin, None),
+        ('GET', '/api/admin/items/pending', as_admin, None),
+        ('GET', '/api/admin/users', as_admin, None),
+        ('GET', '/api/admin/users?sort=items_count&min_swaps=1', as_admin, None),
+        ('GET', '/api/admin/users?sort=swaps_count&order=asc&cursor=', as_admin, None),
+        ('GET', '/api/admin/reports', as_admin, None),
+        ('GET', '/api/admin/analytics?interval=hour&metric=items_listed', as_admin, None),
+        ('POST', f'/api/admin/items/{items[0].id}/moderate', as_admin, {"action": "approve"}),
+    ]
+
+
+def capture(app, method, url, headers, body):
+    statements = []
+    endpoint = {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        with app.test_request_context(url, method=method):
+            endpoint['name'] = app.url_map.bind('').match(url.split('?')[0], method=method)[0]
+        db.session.expunge_all()
+        response = app.test_client().open(url, method=method, headers=headers, json=body)
+        assert response.status_code < 400, (url, response.get_json())
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return endpoint['name'], statements
+
+
+def sqlite_scans(conn, statement, parameters, tables):
+    rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    scans = set()
+    for row in rows:
+        match = re.match(r'SCAN (\w+)(.*)', row[-1])
+        if match and match.group(1) in tables and 'INDEX' not in match.group(2):
+            scans.add(match.group(1))
+    return scans
+
+
+def postgres_scans(conn, statement, parameters, tables):
+    conn.exec_driver_sql('SET enable_seqscan = off')
+    plan = conn.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+    scans = set()
+
+    def walk(node):
+        if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') in tables:
+            scans.add(node['Relation Name'])
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(plan[0]['Plan'])
+    conn.exec_driver_sql('RESET enable_seqscan')
+    return scans
+
+
+def main():
+    app = make_app()
+    failures = 0
+    with app.app_context():
+        admin, users, items = seed()
+        if db.engine.dialect.name == 'sqlite':
+            explain = sqlite_scans
+        else:
+            explain = postgres_scans
+            with db.engine.begin() as conn:
+                conn.execute(text('ANALYZE'))
+        tables = set(db.metadata.tables)
+
+        for method, url, headers, body in endpoints(admin, users, items):
+            name, statements = capture(app, method, url, headers, body)
+            allowed = ALLOWED_SCANS.get(url, ALLOWED_SCANS.get(name, set()))
+            with db.engine.connect() as conn:
+                for statement, parameters in statements:
+                    scans = explain(conn, statement, parameters, tables) - allowed
+                    if scans:
+                        failures += 1
+                        print(f"FULL SCAN on {', '.join(sorted(scans))} in {name} ({method} {url}):")
+                        print('    ' + ' '.join(statement.split()))
+            print(f"{name:32} {method:4} {url:45} {len(statements)} queries checked")
+
+    print(f"{failures} full table scan(s) found")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
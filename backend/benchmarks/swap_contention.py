@@ -0,0 +1,143 @@
+"""Parallel accepts of competing swap requests.
+
+Every one of BENCH_ITEMS (default 50) items owned by one user receives
+BENCH_REQUESTS (default 8) pending requests, half paid with points and
+half offering one of the requesters' own items. Threads then try to
+accept all of them at once through the real endpoint. Afterwards:
+
+* no item takes part in more than one accepted swap,
+* exactly the items in accepted swaps are marked swapped,
+* no pending swap is left on a swapped item,
+* every losing points swap is refunded exactly once (zero ledger drift).
+
+Exits non-zero if any of these fail.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from benchmarks.common import make_app, auth_headers, seed_users, seed_items
+from app import db
+from app.models import User, Item, Swap, Redemption
+from app.utils.points import find_drift
+from config import Config
+
+# Writers queue on SQLite's lock instead of failing fast
+Config.SQLALCHEMY_ENGINE_OPTIONS = {"connect_args": {"timeout": 60}}
+
+
+THREADS = int(os.getenv('BENCH_THREADS', 8))
+ITEMS = int(os.getenv('BENCH_ITEMS', 50))
+REQUESTS_PER_ITEM = int(os.getenv('BENCH_REQUESTS', 8))
+REQUESTERS = 8
+
+
+def seed(app):
+    client = app.test_client()
+    admin, owner, *requesters = seed_users(REQUESTERS + 2)
+    admin.is_admin = True
+    items = seed_items([owner], per_user=ITEMS, images_per_item=1)
+    offered = {user.id: seed_items([user], per_user=ITEMS // 2 + 1, images_per_item=1) for user in requesters}
+    db.session.commit()
+
+    for user in requesters:
+        client.post(f'/api/admin/users/{user.id}/add-points', json={"points": 10 * ITEMS * REQUESTS_PER_ITEM},
+                    headers=auth_headers(admin.id))
+
+    swap_ids = []
+    for n, item in enumerate(items):
+        for k in range(REQUESTS_PER_ITEM):
+            user = requesters[(n + k) % len(requesters)]
+            if k % 2:
+                body = {"swap_type": 'direct', "offered_item_id": offered[user.id][n % len(offered[user.id])].id}
+            else:
+                body = {"swap_type": 'points', "points_used": 1 + k}
+            response = client.post('/api/swap/request', headers=auth_headers(user.id),
+                                   json=dict(body, requested_item_id=item.id))
+            if response.status_code == 201:
+                swap_ids.append(response.get_json()['swap_id'])
+    return owner.id, swap_ids
+
+
+def worker(app, owner_id, swap_ids, stats, lock):
+    client = app.test_client()
+    with app.app_context():
+        headers = auth_headers(owner_id)
+
+    for swap_id in swap_ids:
+        response = client.post(f'/api/swap/{swap_id}/respond', json={"action": 'accept'}, headers=headers)
+        with lock:
+            stats[response.status_code] += 1
+
+
+def check():
+    """Return a list of invariant violations"""
+    problems = []
+    accepted = Swap.query.filter_by(status='accepted').all()
+
+    involvement = Counter()
+    for swap in accepted:
+        involvement[swap.requested_item_id] += 1
+        if swap.offered_item_id:
+            involvement[swap.offered_item_id] += 1
+    problems += [f"item {item_id} in {count} accepted swaps" for item_id, count in involvement.items() if count > 1]
+
+    swapped = {item_id for (item_id,) in db.session.query(Item.id).filter_by(status='swapped')}
+    if swapped != set(involvement):
+        problems.append(f"{len(swapped ^ set(involvement))} item(s) with status not matching accepted swaps")
+
+    stranded = Swap.query.filter(Swap.status == 'pending', db.or_(
+        Swap.requested_item_id.in_(swapped), Swap.offered_item_id.in_(swapped)
+    )).count()
+    if stranded:
+        problems.append(f"{stranded} pending swap(s) on swapped items")
+
+    for status, expected in (('accepted', 'completed'), ('rejected', 'cancelled')):
+        wrong = db.session.query(Redemption).join(Swap, Redemption.swap_id == Swap.id).filter(
+            Swap.status == status, Redemption.status != expected
+        ).count()
+        if wrong:
+            problems.append(f"{wrong} redemption(s) of {status} swaps not {expected}")
+
+    drift = find_drift()
+    if drift:
+        problems.append(f"{len(drift)} drifted balance(s)")
+    if User.query.filter(User.points_balance < 0).count():
+        problems.append("negative balances")
+    return problems
+
+
+def main():
+    app = make_app()
+    with app.app_context():
+        owner_id, swap_ids = seed(app)
+
+    random.Random(0).shuffle(swap_ids)
+    chunks = [swap_ids[n::THREADS] for n in range(THREADS)]
+    stats, lock = Counter(), threading.Lock()
+    threads = [threading.Thread(target=worker, args=(app, owner_id, chunk, stats, lock)) for chunk in chunks]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        problems = check()
+        statuses = dict(db.session.query(Swap.status, db.func.count(Swap.id)).group_by(Swap.status).all())
+
+    print(f"{len(swap_ids)} accepts on {ITEMS} items from {THREADS} threads in {elapsed:.2f}s "
+          f"({len(swap_ids) / elapsed:.0f} accepts/s)")
+    print("responses: " + ", ".join(f"{code}: {count}" for code, count in sorted(stats.items())))
+    print("swaps: " + ", ".join(f"{status} {count}" for status, count in sorted(statuses.items())))
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    print("all invariants hold" if not problems else f"{len(problems)} invariant(s) violated")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Trade-cycle matching on a large wants graph.
+
+Builds an in-memory graph of BENCH_EDGES (default 1,000,000) pending
+requests between BENCH_USERS (default 100,000) users, clustered so that
+most requests stay inside small communities as they do between people
+with similar sizes and styles. Then measures:
+
+* graph build time,
+* incremental add/remove throughput,
+* cycle lookup latency per user, checked against a brute-force search,
+
+and finally runs a three-user ring end to end through the API. Exits
+non-zero if any check fails.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from benchmarks.common import make_app, auth_headers, seed_users, seed_items
+from app.utils import matching
+
+
+EDGES = int(os.getenv('BENCH_EDGES', 1_000_000))
+USERS = int(os.getenv('BENCH_USERS', 100_000))
+CLUSTER = 50
+LOOKUPS = 2000
+CHECKED = 200
+
+
+def random_edges(rng, count, start_id=1):
+    for swap_id in range(start_id, start_id + count):
+        requester = rng.randrange(USERS)
+        if rng.random() < 0.8:
+            owner = requester - requester % CLUSTER + rng.randrange(CLUSTER)
+        else:
+            owner = rng.randrange(USERS)
+        if owner == requester:
+            owner = (owner + 1) % USERS
+        yield swap_id, requester, owner, swap_id
+
+
+def brute_force_cycles(user_id):
+    """Every simple cycle of 2 to 4 users starting at user_id, by plain DFS"""
+    wants = matching._graph['wants']
+    found = set()
+
+    def walk(path):
+        for nxt in wants.get(path[-1], ()):
+            if nxt == user_id and len(path) >= 2:
+                found.add(tuple(path))
+            elif nxt not in path and len(path) < 4:
+                walk(path + [nxt])
+
+    walk([user_id])
+    return found
+
+
+def percentile(values, fraction):
+    return sorted(values)[int(len(values) * fraction)]
+
+
+def end_to_end():
+    """Three users who each want the next one's item are offered the ring"""
+    app = make_app()
+    with app.app_context():
+        users = seed_users(3)
+        items = [seed_items([user], per_user=1, images_per_item=0)[0] for user in users]
+        ids = [(user.id, item.id) for user, item in zip(users, items)]
+
+    client = app.test_client()
+    with app.app_context():
+        headers = {user_id: auth_headers(user_id) for user_id, item_id in ids}
+    matching.reset_graph()
+
+    swap_ids = []
+    for (user_id, own_item), (next_user, wanted_item) in zip(ids, ids[1:] + ids[:1]):
+        response = client.post('/api/swap/request', headers=headers[user_id], json={
+            "requested_item_id": wanted_item, "swap_type": 'direct', "offered_item_id": own_item
+        })
+        swap_ids.append(response.get_json()['swap_id'])
+
+    first_user = ids[0][0]
+    cycles = client.get('/api/swap/cycles', headers=headers[first_user]).get_json()['cycles']
+    ring_found = len(cycles) == 1 and [step['swap_id'] for step in cycles[0]['steps']] == swap_ids
+
+    # Accepting one leg closes the ring (the competing request on the same items is rejected)
+    client.post(f'/api/swap/{swap_ids[0]}/respond', json={"action": 'accept'}, headers=headers[ids[1][0]])
+    cycles = client.get('/api/swap/cycles', headers=headers[first_user]).get_json()['cycles']
+    return ring_found, not cycles
+
+
+def main():
+    problems = []
+    rng = random.Random(0)
+    matching.reset_graph()
+
+    start = time.perf_counter()
+    matching.add_wants(random_edges(rng, EDGES))
+    build = time.perf_counter() - start
+    print(f"built graph of {len(matching._graph['swaps'])} edges over {USERS} users in {build:.2f}s")
+
+    users = [rng.randrange(USERS) for _ in range(LOOKUPS)]
+    latencies, found = [], 0
+    for user_id in users:
+        start = time.perf_counter()
+        cycles = matching.find_cycles(user_id, limit=10)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += bool(cycles)
+    print(f"cycle lookups: p50 {statistics.median(latencies):.2f} ms, "
+          f"p99 {percentile(latencies, 0.99):.2f} ms, {found}/{LOOKUPS} users have a cycle")
+
+    mismatched = 0
+    for user_id in users[:CHECKED]:
+        expected = brute_force_cycles(user_id)
+        if {tuple(cycle) for cycle in matching.find_cycles(user_id, limit=10 ** 9)} != expected:
+            mismatched += 1
+    print(f"checked {CHECKED} users against brute force: {mismatched} mismatched")
+    if mismatched:
+        problems.append("cycle search disagrees with brute force")
+
+    operations = 100_000
+    new_edges = list(random_edges(rng, operations // 2, start_id=EDGES + 1))
+    removed = rng.sample(range(1, EDGES + 1), operations // 2)
+    start = time.perf_counter()
+    for row, swap_id in zip(new_edges, removed):
+        matching.add_wants([row])
+        matching.swaps_closed([swap_id])
+    elapsed = time.perf_counter() - start
+    print(f"{operations} incremental updates in {elapsed:.2f}s ({operations / elapsed:.0f} ops/s)")
+    if len(matching._graph['swaps']) != EDGES:
+        problems.append("edge count drifted after incremental updates")
+
+    ring_found, ring_closed = end_to_end()
+    print(f"end to end: ring suggested {ring_found}, ring gone after accept {ring_closed}")
+    if not (ring_found and ring_closed):
+        problems.append("end-to-end ring check failed")
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
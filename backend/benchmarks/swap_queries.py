@@ -0,0 +1,75 @@
+"""Query counts and latency of the swap request lists for heavy users.
+
+One requester sends BENCH_SWAPS (default 5000) requests to items owned by
+many users, and one owner receives as many. Both lists are fetched at
+several page sizes, by page number and by cursor; the query count must
+stay the same.
+"""
+import os
+import sys
+import time
+from benchmarks.common import make_app, count_queries, auth_headers, seed_users, seed_items
+from app import db
+from app.models import Swap
+
+
+SWAP_COUNT = int(os.getenv('BENCH_SWAPS', 5000))
+PAGE_SIZES = (10, 50, 100)
+
+
+def seed():
+    requester, owner, *others = seed_users(52)
+    requester_items = seed_items([requester], per_user=50, images_per_item=1)
+    owner_items = seed_items([owner], per_user=50, images_per_item=1)
+    other_items = seed_items(others, per_user=20, images_per_item=1)
+
+    rows = []
+    for n in range(SWAP_COUNT):
+        # Outgoing requests from the heavy requester
+        rows.append({"requester_id": requester.id, "requested_item_id": other_items[n % len(other_items)].id,
+                     "offered_item_id": requester_items[n % len(requester_items)].id,
+                     "swap_type": 'direct', "status": 'pending'})
+        # Incoming requests for the popular owner
+        sender = others[n % len(others)]
+        rows.append({"requester_id": sender.id, "requested_item_id": owner_items[n % len(owner_items)].id,
+                     "offered_item_id": other_items[n % len(other_items)].id,
+                     "swap_type": 'direct', "status": 'pending'})
+    db.session.execute(Swap.__table__.insert(), rows)
+    db.session.commit()
+    return requester, owner
+
+
+def main():
+    app = make_app()
+    failed = False
+    with app.app_context():
+        requester, owner = seed()
+        client = app.test_client()
+        lists = {
+            'my-requests': ('/api/swap/my-requests', auth_headers(requester.id)),
+            'received-requests': ('/api/swap/received-requests', auth_headers(owner.id)),
+        }
+
+        print(f"{SWAP_COUNT} swaps per list")
+        for name, (url, headers) in lists.items():
+            # Warm the signed-in user cache so every size pays the same fixed cost
+            client.get(f'{url}?per_page={PAGE_SIZES[0]}', headers=headers)
+            for mode in ('page=1', 'cursor='):
+                counts = []
+                for per_page in PAGE_SIZES:
+                    db.session.expunge_all()
+                    start = time.perf_counter()
+                    with count_queries() as counter:
+                        response = client.get(f'{url}?{mode}&per_page={per_page}', headers=headers)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    assert response.status_code == 200, response.get_json()
+                    assert len(response.get_json()['swaps']) == per_page
+                    counts.append(counter['count'])
+                    print(f"{name:18} {mode:8} per_page={per_page:<4} {counter['count']} queries {elapsed:7.1f} ms")
+                failed |= len(set(counts)) != 1
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -14,6 +14,44 @@ class Config:
     CLOUDINARY_API_SECRET = os.getenv('CLOUDINARY_API_SECRET', 'k-5ER4n-l_sLVzX1iGmfpyuWf2I')
     UPLOAD_FOLDER = 'app/static/uploads'
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 8))  # shared image upload threads
+    UPLOAD_TIMEOUT = int(os.getenv('UPLOAD_TIMEOUT', 30))  # seconds per request
+    DERIVATIVE_WORKERS = int(os.getenv('DERIVATIVE_WORKERS', 2))  # thumbnail rendering threads, apart from uploads
+    IMAGE_STORAGE = os.getenv('IMAGE_STORAGE', 'cloudinary')  # 'cloudinary' or 'local'
+    LOCAL_STORAGE_URL = os.getenv('LOCAL_STORAGE_URL', 'http://127.0.0.1:5000/static/uploads')
+    IMAGE_INGEST_MODE = os.getenv('IMAGE_INGEST_MODE', 'sync')  # 'sync' or 'async'
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 2))
+    INGEST_STALE_MINUTES = int(os.getenv('INGEST_STALE_MINUTES', 15))  # resume-ingest skips items newer than this
+    DERIVATIVE_CACHE_BYTES = int(os.getenv('DERIVATIVE_CACHE_BYTES', 256 * 1024 * 1024))  # local thumbnail cache
+    MAX_PER_PAGE = int(os.getenv('MAX_PER_PAGE', 100))
+    SWAP_TTL_DAYS = int(os.getenv('SWAP_TTL_DAYS', 14))  # pending requests expire after this
+    SWAP_SWEEP_INTERVAL = int(os.getenv('SWAP_SWEEP_INTERVAL', 3600))  # seconds, 0 disables the sweeper
+    BACKGROUND_THREADS = os.getenv('BACKGROUND_THREADS', 'true').lower() == 'true'  # sweeper and event poller threads, started on first request
+    SWAP_SWEEP_BATCH_SIZE = int(os.getenv('SWAP_SWEEP_BATCH_SIZE', 500))
+    MATCHING_SYNC_OVERLAP = int(os.getenv('MATCHING_SYNC_OVERLAP', 300))  # seconds of swaps re-read per cycle sync
+    EVENT_BROKER = os.getenv('EVENT_BROKER', 'memory')  # 'memory' (one worker) or 'database'
+    EVENT_POLL_INTERVAL = float(os.getenv('EVENT_POLL_INTERVAL', 1))  # seconds, database broker
+    EVENT_RETENTION = int(os.getenv('EVENT_RETENTION', 600))  # seconds, database broker
+    EVENT_QUEUE_SIZE = int(os.getenv('EVENT_QUEUE_SIZE', 100))  # per stream before it is dropped
+    SSE_KEEPALIVE = int(os.getenv('SSE_KEEPALIVE', 15))  # seconds
+    SSE_RETRY_MS = int(os.getenv('SSE_RETRY_MS', 5000))
+    EXPORT_CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', 10000))  # rows per export query
+    EXPORT_YIELD_PER = int(os.getenv('EXPORT_YIELD_PER', 1000))  # rows fetched per round trip
+    MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 100))  # entries per bulk request
+    FACET_CACHE_TTL = int(os.getenv('FACET_CACHE_TTL', 300))  # seconds
+    DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', 10))  # seconds
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))  # seconds a signed-in user is served from memory
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))  # users kept per process
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')  # werkzeug method with its parameters; older hashes upgrade at login
+    HASH_WORKERS = int(os.getenv('HASH_WORKERS', 2))  # password hashing processes, 0 hashes on the request thread
+    HASH_QUEUE_LIMIT = int(os.getenv('HASH_QUEUE_LIMIT', 16))  # hashes queued per server process before answering 503
+    HASH_TIMEOUT = int(os.getenv('HASH_TIMEOUT', 10))  # seconds
+    ANALYTICS_MAX_BUCKETS = int(os.getenv('ANALYTICS_MAX_BUCKETS', 2000))  # hours or days per analytics query
+    PUBLIC_CACHE_MAX_AGE = int(os.getenv('PUBLIC_CACHE_MAX_AGE', 60))  # seconds
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'  # request timing and /metrics
+    METRICS_LOG_SAMPLE_RATE = float(os.getenv('METRICS_LOG_SAMPLE_RATE', 0.01))  # share of requests logged as JSON
+    METRICS_SLOW_REQUEST_MS = float(os.getenv('METRICS_SLOW_REQUEST_MS', 1000))  # always logged at or above this
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # bearer token for /metrics; unset, /metrics is not served
     JWT_TOKEN_LOCATION = ["cookies", "headers"]
     JWT_COOKIE_SECURE = False  # Set to True only in production (HTTPS)
     JWT_COOKIE_SAMESITE = "Lax"  # Use Lax for localhost development
@@ -0,0 +1,102 @@
+"""normalized item tag index
+
+Revision ID: 3f1c2a7b9d10
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7b9d10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 1000
+
+
+def parse_tags(tags):
+    names = []
+    for name in (tags or '').split(','):
+        name = name.strip().lower()[:50]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def upgrade():
+    bind = op.get_bind()
+    existing = sa.inspect(bind).get_table_names()
+
+    # db.create_all() may already have created the tables on app start
+    if 'tags' not in existing:
+        op.create_table(
+            'tags',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('item_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('name')
+        )
+    if 'item_tags' not in existing:
+        op.create_table(
+            'item_tags',
+            sa.Column('item_id', sa.Integer(), nullable=False),
+            sa.Column('tag_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['item_id'], ['items.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('item_id', 'tag_id')
+        )
+        op.create_index('ix_item_tags_tag_id_item_id', 'item_tags', ['tag_id', 'item_id'])
+
+    # Backfill from the comma-separated Item.tags column, in id order batches
+    items = sa.table('items', sa.column('id', sa.Integer), sa.column('tags', sa.String))
+    tags = sa.table('tags', sa.column('id', sa.Integer), sa.column('name', sa.String),
+                    sa.column('item_count', sa.Integer))
+    item_tags = sa.table('item_tags', sa.column('item_id', sa.Integer), sa.column('tag_id', sa.Integer))
+
+    tag_ids = dict(bind.execute(sa.select(tags.c.name, tags.c.id)).all())
+    tagged = set(bind.execute(sa.select(item_tags.c.item_id).distinct()).scalars().all())
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(items.c.id, items.c.tags)
+            .where(items.c.id > last_id)
+            .order_by(items.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        links = []
+        for item_id, item_tags_string in rows:
+            if item_id in tagged:
+                continue
+            for name in parse_tags(item_tags_string):
+                if name not in tag_ids:
+                    tag_ids[name] = bind.execute(
+                        tags.insert().values(name=name, item_count=0).returning(tags.c.id)
+                    ).scalar()
+                links.append({"item_id": item_id, "tag_id": tag_ids[name]})
+        if links:
+            bind.execute(item_tags.insert(), links)
+
+    bind.execute(sa.text("""
+        UPDATE tags SET item_count = (
+            SELECT count(*) FROM item_tags
+            JOIN items ON items.id = item_tags.item_id
+            WHERE item_tags.tag_id = tags.id
+              AND items.approved = :approved AND items.status = 'available'
+        )
+    """), {"approved": True})
+
+
+def downgrade():
+    op.drop_index('ix_item_tags_tag_id_item_id', table_name='item_tags')
+    op.drop_table('item_tags')
+    op.drop_table('tags')
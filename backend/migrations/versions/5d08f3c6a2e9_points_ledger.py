@@ -0,0 +1,57 @@
+"""points ledger and nullable offered item for points swaps
+
+Revision ID: 5d08f3c6a2e9
+Revises: e7a3b1f90c26
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d08f3c6a2e9'
+down_revision = 'e7a3b1f90c26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if 'points_ledger' not in inspector.get_table_names():
+        op.create_table(
+            'points_ledger',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('delta', sa.Integer(), nullable=False),
+            sa.Column('balance_after', sa.Integer(), nullable=False),
+            sa.Column('reason', sa.String(length=50), nullable=False),
+            sa.Column('swap_id', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.ForeignKeyConstraint(['swap_id'], ['swaps.id'], ondelete='SET NULL'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_points_ledger_user_id_id', 'points_ledger', ['user_id', 'id'])
+
+    # Points swaps have no offered item
+    with op.batch_alter_table('swaps') as batch_op:
+        batch_op.alter_column('offered_item_id', existing_type=sa.Integer(), nullable=True)
+
+    # Open the ledger with every existing balance so reconciliation starts at zero drift
+    op.execute("UPDATE users SET points_balance = 0 WHERE points_balance IS NULL")
+    op.get_bind().execute(sa.text("""
+        INSERT INTO points_ledger (user_id, delta, balance_after, reason, created_at)
+        SELECT id, points_balance, points_balance, 'opening_balance', :now FROM users
+        WHERE points_balance != 0
+          AND NOT EXISTS (SELECT 1 FROM points_ledger WHERE points_ledger.user_id = users.id)
+    """), {"now": datetime.utcnow()})
+
+
+def downgrade():
+    with op.batch_alter_table('swaps') as batch_op:
+        batch_op.alter_column('offered_item_id', existing_type=sa.Integer(), nullable=False)
+    op.drop_index('ix_points_ledger_user_id_id', table_name='points_ledger')
+    op.drop_table('points_ledger')
@@ -0,0 +1,48 @@
+"""indexes for listing, swap and moderation queries
+
+Revision ID: 8b4e61d2c7a5
+Revises: 3f1c2a7b9d10
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e61d2c7a5'
+down_revision = '3f1c2a7b9d10'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_users_created_at', 'users', ['created_at']),
+    ('ix_items_approved_status_created_at', 'items', ['approved', 'status', 'created_at']),
+    ('ix_items_created_at', 'items', ['created_at']),
+    ('ix_items_category_created_at', 'items', ['category', 'created_at']),
+    ('ix_items_uploader_id_created_at', 'items', ['uploader_id', 'created_at']),
+    ('ix_tags_item_count', 'tags', ['item_count']),
+    ('ix_item_images_item_id', 'item_images', ['item_id']),
+    ('ix_swaps_requester_id_created_at', 'swaps', ['requester_id', 'created_at']),
+    ('ix_swaps_requested_item_id_status', 'swaps', ['requested_item_id', 'status']),
+    ('ix_swaps_offered_item_id', 'swaps', ['offered_item_id']),
+    ('ix_swaps_created_at', 'swaps', ['created_at']),
+    ('ix_redemptions_user_id_item_id', 'redemptions', ['user_id', 'item_id']),
+    ('ix_redemptions_item_id', 'redemptions', ['item_id']),
+    ('ix_admin_actions_created_at', 'admin_actions', ['created_at']),
+    ('ix_admin_actions_item_id', 'admin_actions', ['item_id']),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        # db.create_all() creates these on new databases
+        if name not in {index['name'] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
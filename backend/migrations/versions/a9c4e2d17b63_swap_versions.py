@@ -0,0 +1,52 @@
+"""version columns on items and swaps, redemptions linked to their swap
+
+Revision ID: a9c4e2d17b63
+Revises: 5d08f3c6a2e9
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c4e2d17b63'
+down_revision = '5d08f3c6a2e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    for table in ('items', 'swaps'):
+        if 'version' not in {column['name'] for column in inspector.get_columns(table)}:
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+    if 'swap_id' not in {column['name'] for column in inspector.get_columns('redemptions')}:
+        with op.batch_alter_table('redemptions') as batch_op:
+            batch_op.add_column(sa.Column('swap_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_redemptions_swap_id', 'swaps', ['swap_id'], ['id'], ondelete='SET NULL')
+            batch_op.create_index('ix_redemptions_swap_id', ['swap_id'])
+
+    # Redemptions used to be matched to swaps by requester and item; link each to the oldest such swap
+    op.execute("""
+        UPDATE redemptions SET swap_id = (
+            SELECT MIN(swaps.id) FROM swaps
+            WHERE swaps.requester_id = redemptions.user_id
+              AND swaps.requested_item_id = redemptions.item_id
+              AND swaps.swap_type = 'points'
+        )
+        WHERE swap_id IS NULL
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('redemptions') as batch_op:
+        batch_op.drop_index('ix_redemptions_swap_id')
+        batch_op.drop_constraint('fk_redemptions_swap_id', type_='foreignkey')
+        batch_op.drop_column('swap_id')
+    for table in ('swaps', 'items'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('version')
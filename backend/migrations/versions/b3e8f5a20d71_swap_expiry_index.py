@@ -0,0 +1,26 @@
+"""index for expiring stale pending swaps
+
+Revision ID: b3e8f5a20d71
+Revises: a9c4e2d17b63
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e8f5a20d71'
+down_revision = 'a9c4e2d17b63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'ix_swaps_status_created_at' not in {index['name'] for index in inspector.get_indexes('swaps')}:
+        op.create_index('ix_swaps_status_created_at', 'swaps', ['status', 'created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_swaps_status_created_at', table_name='swaps')
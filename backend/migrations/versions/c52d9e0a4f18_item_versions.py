@@ -0,0 +1,45 @@
+"""item updated_at and catalog version for HTTP validators
+
+Revision ID: c52d9e0a4f18
+Revises: 8b4e61d2c7a5
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c52d9e0a4f18'
+down_revision = '8b4e61d2c7a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if 'updated_at' not in {column['name'] for column in inspector.get_columns('items')}:
+        with op.batch_alter_table('items') as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE items SET updated_at = created_at WHERE updated_at IS NULL")
+
+    if 'catalog_version' not in inspector.get_table_names():
+        op.create_table(
+            'catalog_version',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+    catalog_version = sa.table('catalog_version', sa.column('id', sa.Integer),
+                               sa.column('version', sa.Integer), sa.column('updated_at', sa.DateTime))
+    if not op.get_bind().execute(sa.select(catalog_version.c.id)).first():
+        op.bulk_insert(catalog_version, [{"id": 1, "version": 1, "updated_at": datetime.utcnow()}])
+
+
+def downgrade():
+    op.drop_table('catalog_version')
+    with op.batch_alter_table('items') as batch_op:
+        batch_op.drop_column('updated_at')
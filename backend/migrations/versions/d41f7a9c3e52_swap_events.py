@@ -0,0 +1,36 @@
+"""swap events table for the database event broker
+
+Revision ID: d41f7a9c3e52
+Revises: b3e8f5a20d71
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41f7a9c3e52'
+down_revision = 'b3e8f5a20d71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'swap_events' not in inspector.get_table_names():
+        op.create_table(
+            'swap_events',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('type', sa.String(length=50), nullable=False),
+            sa.Column('user_ids', sa.Text(), nullable=False),
+            sa.Column('payload', sa.Text(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_swap_events_created_at', 'swap_events', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_swap_events_created_at', table_name='swap_events')
+    op.drop_table('swap_events')
@@ -0,0 +1,43 @@
+"""stats counters for the admin dashboard
+
+Revision ID: e58b2c4d9a07
+Revises: d41f7a9c3e52
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e58b2c4d9a07'
+down_revision = 'd41f7a9c3e52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'stats_counters' not in inspector.get_table_names():
+        op.create_table(
+            'stats_counters',
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('value', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('name')
+        )
+
+    # Seed from the current tables; later writes keep the counters moving
+    op.execute("DELETE FROM stats_counters")
+    op.execute("""
+        INSERT INTO stats_counters (name, value)
+        SELECT 'users', COUNT(*) FROM users
+        UNION ALL SELECT 'items', COUNT(*) FROM items
+        UNION ALL SELECT 'items_pending', COUNT(*) FROM items WHERE approved IS NOT TRUE
+        UNION ALL SELECT 'swaps', COUNT(*) FROM swaps
+        UNION ALL SELECT 'swaps_completed', COUNT(*) FROM swaps WHERE status = 'accepted'
+        UNION ALL SELECT 'category:' || category, COUNT(*) FROM items GROUP BY category
+    """)
+
+
+def downgrade():
+    op.drop_table('stats_counters')
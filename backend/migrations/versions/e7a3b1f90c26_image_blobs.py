@@ -0,0 +1,42 @@
+"""content-addressed image index
+
+Revision ID: e7a3b1f90c26
+Revises: c52d9e0a4f18
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a3b1f90c26'
+down_revision = 'c52d9e0a4f18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if 'image_blobs' not in inspector.get_table_names():
+        op.create_table(
+            'image_blobs',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('content_hash', sa.String(length=64), nullable=False),
+            sa.Column('image_url', sa.String(length=255), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('content_hash')
+        )
+
+    # Existing images have no hash; they keep serving their original URL
+    if 'content_hash' not in {column['name'] for column in inspector.get_columns('item_images')}:
+        with op.batch_alter_table('item_images') as batch_op:
+            batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('item_images') as batch_op:
+        batch_op.drop_column('content_hash')
+    op.drop_table('image_blobs')
@@ -0,0 +1,37 @@
+"""hourly and daily activity rollups
+
+Revision ID: f3b7d2e81c46
+Revises: e58b2c4d9a07
+Create Date: 2026-10-18 19:00:00.000000
+
+Only creates the table; run ``flask backfill-rollups`` once afterwards to
+count the existing history.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b7d2e81c46'
+down_revision = 'e58b2c4d9a07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'activity_rollups' not in inspector.get_table_names():
+        op.create_table(
+            'activity_rollups',
+            sa.Column('period', sa.String(length=10), nullable=False),
+            sa.Column('bucket_start', sa.DateTime(), nullable=False),
+            sa.Column('metric', sa.String(length=50), nullable=False),
+            sa.Column('category', sa.String(length=50), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('period', 'bucket_start', 'metric', 'category')
+        )
+
+
+def downgrade():
+    op.drop_table('activity_rollups')
@@ -17,6 +17,16 @@ const Dashboard = () => {
   const [mySwaps, setMySwaps] = useState([]);
   const [receivedSwaps, setReceivedSwaps] = useState([]);
   const [loading, setLoading] = useState(true);
+  // The owner lists are paginated; keep each one's next cursor for "Load more"
+  const [cursors, setCursors] = useState({});
+  const [totals, setTotals] = useState({});
+  const [loadingMore, setLoadingMore] = useState(null);
+
+  const lists = {
+    items: { url: '/items/my-items', field: 'items', setRows: setMyItems },
+    sent: { url: '/swap/my-requests', field: 'swaps', setRows: setMySwaps },
+    received: { url: '/swap/received-requests', field: 'swaps', setRows: setReceivedSwaps }
+  };
 
   useEffect(() => {
     if (user) {
@@ -24,18 +34,34 @@ const Dashboard = () => {
     }
   }, [user]);
 
+  // Refresh swap lists when the server pushes a swap event instead of polling
+  useEffect(() => {
+    if (!user) return;
+
+    const events = new EventSource(`${axiosInstance.defaults.baseURL}/swap/events`, { withCredentials: true });
+    const refresh = () => refreshSwaps();
+    events.addEventListener('swap_created', refresh);
+    events.addEventListener('swap_responded', refresh);
+    events.addEventListener('swap_expired', refresh);
+
+    return () => events.close();
+  }, [user]);
+
+  const fetchFirstPages = async () => {
+    const names = Object.keys(lists);
+    const responses = await Promise.all(names.map((name) =>
+      axiosInstance.get(lists[name].url, { params: { cursor: '', include_total: true } })
+    ));
+
+    names.forEach((name, i) => lists[name].setRows(responses[i].data[lists[name].field]));
+    setCursors(Object.fromEntries(names.map((name, i) => [name, responses[i].data.pagination.next_cursor])));
+    setTotals(Object.fromEntries(names.map((name, i) => [name, responses[i].data.pagination.total])));
+  };
+
   const fetchDashboardData = async () => {
     setLoading(true);
     try {
-      const [itemsRes, swapsRes, receivedRes] = await Promise.all([
-        axiosInstance.get('/items/my-items'),
-        axiosInstance.get('/swap/my-requests'),
-        axiosInstance.get('/swap/received-requests')
-      ]);
-
-      setMyItems(itemsRes.data.items);
-      setMySwaps(swapsRes.data.swaps);
-      setReceivedSwaps(receivedRes.data.swaps);
+      await fetchFirstPages();
     } catch (error) {
       console.error('Error fetching dashboard data:', error);
       toast.error('Failed to load dashboard data');
@@ -44,6 +70,29 @@ const Dashboard = () => {
     }
   };
 
+  const refreshSwaps = async () => {
+    try {
+      await fetchFirstPages();
+    } catch (error) {
+      console.error('Error refreshing swaps:', error);
+    }
+  };
+
+  const loadMore = async (name) => {
+    const list = lists[name];
+    setLoadingMore(name);
+    try {
+      const res = await axiosInstance.get(list.url, { params: { cursor: cursors[name] } });
+      list.setRows((rows) => [...rows, ...res.data[list.field]]);
+      setCursors((current) => ({ ...current, [name]: res.data.pagination.next_cursor }));
+    } catch (error) {
+      console.error('Error loading more:', error);
+      toast.error('Failed to load more');
+    } finally {
+      setLoadingMore(null);
+    }
+  };
+
   const handleSwapResponse = async (swapId, action) => {
     try {
       await axiosInstance.post(`/swap/${swapId}/respond`, { action });
@@ -122,6 +171,14 @@ const Dashboard = () => {
     </Card>
   );
 
+  const LoadMore = ({ name }) => cursors[name] ? (
+    <div className="flex justify-center">
+      <Button variant="outline" disabled={loadingMore === name} onClick={() => loadMore(name)}>
+        {loadingMore === name ? 'Loading...' : 'Load more'}
+      </Button>
+    </div>
+  ) : null;
+
   const SwapCard = ({ swap, type = 'sent' }) => (
     <Card className="p-4">
       <div className="flex justify-between items-start mb-3">
@@ -215,9 +272,9 @@ const Dashboard = () => {
       {/* Tabs for different sections */}
       <Tabs defaultValue="items" className="space-y-6">
         <TabsList>
-          <TabsTrigger value="items">My Items ({myItems.length})</TabsTrigger>
-          <TabsTrigger value="sent-swaps">Sent Requests ({mySwaps.length})</TabsTrigger>
-          <TabsTrigger value="received-swaps">Received Requests ({receivedSwaps.length})</TabsTrigger>
+          <TabsTrigger value="items">My Items ({totals.items ?? myItems.length})</TabsTrigger>
+          <TabsTrigger value="sent-swaps">Sent Requests ({totals.sent ?? mySwaps.length})</TabsTrigger>
+          <TabsTrigger value="received-swaps">Received Requests ({totals.received ?? receivedSwaps.length})</TabsTrigger>
         </TabsList>
 
         <TabsContent value="items" className="space-y-4">
@@ -253,6 +310,7 @@ const Dashboard = () => {
               ))}
             </div>
           )}
+          {!loading && <LoadMore name="items" />}
         </TabsContent>
 
         <TabsContent value="sent-swaps" className="space-y-4">
@@ -280,6 +338,7 @@ const Dashboard = () => {
               ))}
             </div>
           )}
+          {!loading && <LoadMore name="sent" />}
         </TabsContent>
 
         <TabsContent value="received-swaps" className="space-y-4">
@@ -306,6 +365,7 @@ const Dashboard = () => {
               ))}
             </div>
           )}
+          {!loading && <LoadMore name="received" />}
         </TabsContent>
       </Tabs>
     </div>